@@ -33,6 +33,9 @@ config.check()
 tasks = []
 boot = time.time()
 
+from anony.core.startup import Startup
+startup = Startup(boot)
+
 from anony.core.bot import Bot
 app = Bot()
 
@@ -48,26 +51,48 @@ db = MongoDB()
 from anony.core.lang import Language
 lang = Language()
 
+from anony.core.scheduler import Scheduler
+scheduler = Scheduler()
+
+from anony.core.ratelimit import Admission
+admission = Admission()
+
 from anony.core.telegram import Telegram
 from anony.core.youtube import YouTube
 tg = Telegram()
 yt = YouTube()
 
-from anony.helpers import Queue
+from anony.helpers import Queue, thumb
 queue = Queue()
 
+from anony.core.prefetch import Prefetcher
+prefetch = Prefetcher()
+
+from anony.core.executor import ChatExecutor
+executor = ChatExecutor()
+
 from anony.core.calls import TgCall
 anon = TgCall()
 
+from anony.core.broadcast import Broadcaster
+broadcaster = Broadcaster()
+
 
 async def stop() -> None:
     logger.info("Stopping...")
+    try:
+        await anon.snapshot()
+    except Exception as ex:
+        logger.warning(f"Failed to save call snapshot: {ex}")
+
     for task in tasks:
         task.cancel()
         try:
             await task
         except:
             pass
+    await scheduler.stop()
+    thumb.close()
 
     await app.exit()
     await userbot.exit()
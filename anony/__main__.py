@@ -8,30 +8,54 @@ import importlib
 
 from pyrogram import idle
 
-from anony import (anon, app, config, db,
-                   logger, stop, userbot, yt)
+from anony import (anon, app, boot, config, db, logger,
+                   scheduler, startup, stop, tasks, thumb, userbot, yt)
 from anony.plugins import all_modules
 
 
-async def main():
+async def load_database():
     await db.connect()
-    await app.boot()
-    await userbot.boot()
-    await anon.boot()
-
-    for module in all_modules:
-        if module == "eval":
-            continue
-        importlib.import_module(f"anony.plugins.{module}")
-    logger.info(f"Loaded {len(all_modules)} modules.")
+    app.sudoers.update(await db.get_sudoers())
+    app.bl_users.update(await db.get_blacklisted())
+    logger.info(f"Loaded {len(app.sudoers)} sudo users.")
+
+
+async def start_assistants():
+    await startup.run("userbot", userbot.boot())
+    await startup.run("calls", anon.boot())
 
+
+async def main():
+    startup.record("imports", boot)
+    # Before anything starts a thread, see Thumbnail.start.
+    with startup.stage("thumbnails"):
+        thumb.start()
+    # The database, bot and assistants don't depend on each other, so they
+    # start together; plugins are only loaded once all of them are up.
+    stages = [
+        startup.run("database", load_database()),
+        startup.run("bot", app.boot()),
+        startup.run("assistants", start_assistants()),
+    ]
     if config.COOKIES_URL:
-        await yt.save_cookies(config.COOKIES_URL)
+        stages.append(startup.run("cookies", yt.save_cookies(config.COOKIES_URL)))
+    await asyncio.gather(*stages)
 
-    sudoers = await db.get_sudoers()
-    app.sudoers.update(sudoers)
-    app.bl_users.update(await db.get_blacklisted())
-    logger.info(f"Loaded {len(app.sudoers)} sudo users.")
+    with startup.stage("plugins"):
+        for module in all_modules:
+            if module == "eval":
+                continue
+            importlib.import_module(f"anony.plugins.{module}")
+    logger.info(f"Loaded {len(all_modules)} modules.")
+    tasks.append(scheduler.start())
+
+    await startup.run("restore", anon.restore())
+    if config.WARM_ADMIN_RATE > 0:
+        tasks.append(asyncio.create_task(
+            db.warm_admins(db.recent_chats(config.WARM_CHATS), config.WARM_ADMIN_RATE)
+        ))
+    startup.done()
+    logger.info(startup.report())
 
     await idle()
     await stop()
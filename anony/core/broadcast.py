@@ -0,0 +1,276 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import time
+from uuid import uuid4
+
+from pyrogram import errors, types
+
+from anony import app, config, db, logger
+from anony.core.ratelimit import TokenBucket
+from anony.core.storage import ReplaceOne
+
+
+class Broadcaster:
+    """
+    Sends a message to every chat and/or user, paced by a token bucket and
+    a bounded number of concurrent sends.
+
+    Targets are read from the in-memory indexes in id order, one page at a
+    time. Every target of a page is recorded as pending in the broadcast log
+    before anything is sent to it, and the job's checkpoint moves past the
+    page once it is done. A resumed broadcast skips every target that has a
+    record, so nobody gets the message twice; targets that were in flight
+    when the process died are counted as unknown instead of retried. The
+    records of a job are dropped once it is done and reported, or when a
+    new broadcast supersedes it before it was resumed.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(config.GCAST_RATE)
+        self.workers = config.GCAST_WORKERS
+        self.page = 200
+        self.jobs = db.db.broadcasts
+        self.log = db.db.broadcast_log
+
+        self.job: dict | None = None
+        self.task: asyncio.Task | None = None
+        self.busy = False
+        self.stopping = False
+        self.started = 0.0
+        self.resumed_at = 0
+        self.prepared = False
+
+    @property
+    def active(self) -> bool:
+        return self.busy
+
+    def claim(self) -> bool:
+        """
+        Reserve the broadcaster for a new broadcast, returning False if one
+        is already being prepared or running. Must be released when done.
+        """
+        if self.busy:
+            return False
+        self.busy = True
+        self.stopping = False
+        return True
+
+    def release(self) -> None:
+        self.busy = False
+
+    async def last(self) -> dict | None:
+        """Return the latest broadcast that was stopped or interrupted."""
+        cursor = self.jobs.find({"status": {"$in": ["running", "stopped"]}})
+        async for job in cursor.sort("started", -1):
+            return job
+        return None
+
+    async def _prepare(self) -> None:
+        """Index the log by job and drop the records of finished jobs, once."""
+        if self.prepared:
+            return
+        if hasattr(self.log, "create_index"):
+            await self.log.create_index("job")
+        done = [job["_id"] async for job in self.jobs.find({"status": "done"}, {"_id": 1})]
+        if done:
+            await self.log.delete_many({"job": {"$in": done}})
+        self.prepared = True
+
+    async def _supersede(self) -> None:
+        """Give up on the stopped and interrupted broadcasts, and drop their log."""
+        old = [
+            job["_id"]
+            async for job in self.jobs.find({"status": {"$in": ["running", "stopped"]}}, {"_id": 1})
+        ]
+        if not old:
+            return
+        await self.log.delete_many({"job": {"$in": old}})
+        for _id in old:
+            await self.jobs.update_one({"_id": _id}, {"$set": {"status": "superseded"}})
+
+    async def start(
+        self, message: types.Message, chats: bool, users: bool, copy: bool, by: int
+    ) -> asyncio.Task:
+        await self._prepare()
+        await self._supersede()
+        phases = [kind for kind, wanted in (("chats", chats), ("users", users)) if wanted]
+        total = len(await db.get_chats()) if chats else 0
+        total += len(await db.get_users()) if users else 0
+        job = {
+            "_id": uuid4().hex[:12],
+            "chat_id": message.chat.id,
+            "message_id": message.id,
+            "copy": copy,
+            "by": by,
+            "phases": phases,
+            "phase": 0,
+            "last": None,
+            "total": total,
+            "sent_chats": 0,
+            "sent_users": 0,
+            "failed": 0,
+            "unknown": 0,
+            "status": "running",
+            "started": time.time(),
+        }
+        await self.jobs.insert_one(job)
+        return self._run(job, message)
+
+    async def resume(self, job: dict) -> asyncio.Task:
+        """
+        Continue a broadcast from its checkpoint.
+
+        Raises:
+            ValueError: If the broadcast message no longer exists.
+        """
+        message = await app.get_messages(job["chat_id"], job["message_id"])
+        if not message or message.empty:
+            raise ValueError("Broadcast message not found")
+        await self._prepare()
+        job["status"] = "running"
+        await self._checkpoint(job)
+        return self._run(job, message)
+
+    def stop(self) -> None:
+        """Stop once the sends of the current page are done."""
+        self.stopping = True
+
+    def _run(self, job: dict, message: types.Message) -> asyncio.Task:
+        self.job = job
+        self.started = time.monotonic()
+        self.resumed_at = self._done(job)
+        self.task = asyncio.create_task(self._broadcast(job, message))
+        return self.task
+
+    async def _broadcast(self, job: dict, message: types.Message) -> dict:
+        limit = asyncio.Semaphore(self.workers)
+        while job["phase"] < len(job["phases"]) and not self.stopping:
+            kind = job["phases"][job["phase"]]
+            index = await (db.get_chats() if kind == "chats" else db.get_users())
+            page = index.after(job["last"], self.page)
+            if not page:
+                job["phase"] += 1
+                job["last"] = None
+                await self._checkpoint(job)
+                continue
+
+            targets = await self._claim(job, kind, page)
+            await asyncio.gather(
+                *(self._send(job, kind, message, chat_id, limit) for chat_id in targets)
+            )
+            job["last"] = page[-1]
+            await self._checkpoint(job)
+
+        job["status"] = "stopped" if self.stopping else "done"
+        job["finished"] = time.time()
+        await self._checkpoint(job)
+        await db.writer.flush()
+        logger.info(
+            f"Broadcast {job['_id']} {job['status']}: {job['sent_chats']} chats, "
+            f"{job['sent_users']} users, {job['failed']} failed, {job['unknown']} unknown."
+        )
+        return job
+
+    async def _claim(self, job: dict, kind: str, page: list[int]) -> list[int]:
+        """
+        Record the page's targets as pending and return the ones that can be
+        sent to, counting those already handled by an interrupted run.
+        """
+        keys = {f"{job['_id']}:{chat_id}": chat_id for chat_id in page}
+        async for doc in self.log.find({"_id": {"$in": list(keys)}}):
+            keys.pop(doc["_id"], None)
+            if doc.get("state") == "sent":
+                job[f"sent_{kind}"] += 1
+            elif doc.get("state") == "failed":
+                job["failed"] += 1
+            else:
+                job["unknown"] += 1
+
+        if keys:
+            await self.log.bulk_write(
+                [
+                    ReplaceOne(
+                        {"_id": key},
+                        {"job": job["_id"], "chat_id": chat_id, "state": "pending"},
+                        upsert=True,
+                    )
+                    for key, chat_id in keys.items()
+                ],
+                ordered=False,
+            )
+        return list(keys.values())
+
+    async def _send(
+        self,
+        job: dict,
+        kind: str,
+        message: types.Message,
+        chat_id: int,
+        limit: asyncio.Semaphore,
+    ) -> None:
+        state, error = "failed", "FloodWait"
+        async with limit:
+            for _ in range(3):
+                await self.bucket.acquire()
+                try:
+                    if job["copy"]:
+                        await message.copy(chat_id, reply_markup=message.reply_markup)
+                    else:
+                        await message.forward(chat_id)
+                    state, error = "sent", None
+                    break
+                except errors.FloodWait as fw:
+                    self.bucket.pause(fw.value)
+                except Exception as ex:
+                    error = f"{type(ex).__name__}: {ex}"
+                    break
+
+        if state == "sent":
+            job[f"sent_{kind}"] += 1
+        else:
+            job["failed"] += 1
+        key = f"{job['_id']}:{chat_id}"
+        db.writer.set(self.log, key, {"job": job["_id"], "chat_id": chat_id, "state": state, "error": error})
+
+    async def _checkpoint(self, job: dict) -> None:
+        await self.jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {k: v for k, v in job.items() if k != "_id"}},
+        )
+
+    @staticmethod
+    def _done(job: dict) -> int:
+        return job["sent_chats"] + job["sent_users"] + job["failed"] + job["unknown"]
+
+    async def failures(self, job: dict) -> list[str]:
+        return [
+            f"{doc['chat_id']} - {doc.get('error')}"
+            async for doc in self.log.find({"job": job["_id"], "state": "failed"})
+        ]
+
+    async def prune(self, job: dict) -> None:
+        """Drop the log of a finished job. Stopped ones keep it to resume."""
+        if job["status"] == "done":
+            await self.log.delete_many({"job": job["_id"]})
+
+    def stats(self) -> dict:
+        job = self.job or {}
+        if not job:
+            return {}
+        done = self._done(job)
+        elapsed = time.monotonic() - self.started
+        rate = (done - self.resumed_at) / elapsed if elapsed else 0.0
+        remaining = max(job["total"] - done, 0)
+        return {
+            "done": done,
+            "total": job["total"],
+            "sent_chats": job["sent_chats"],
+            "sent_users": job["sent_users"],
+            "failed": job["failed"],
+            "rate": rate,
+            "eta": int(remaining / rate) if rate else 0,
+        }
@@ -0,0 +1,116 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import time
+
+from typing import Any
+
+from anony import logger
+from anony.core.storage import DeleteOne, UpdateOne, WriteOp
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer for small, frequent writes.
+
+    Writes are keyed by collection and document id, and only the latest write
+    for a document is kept, so each write must stand on its own (an upsert
+    of the fields it owns, or a delete). Pending writes are flushed as one
+    unordered bulk write per collection once `size` are queued, `delay`
+    seconds after the first one, and on shutdown.
+    """
+
+    def __init__(self, size: int = 500, delay: float = 2.0):
+        self.size = size
+        self.delay = delay
+        self.collections: dict[str, Any] = {}
+        self.pending: dict[tuple[str, int], WriteOp] = {}
+        self.timer: asyncio.TimerHandle | None = None
+        self.task: asyncio.Task | None = None
+
+        self.flushes = 0
+        self.written = 0
+        self.errors = 0
+        self.last_time = 0.0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def _add(self, coll: Any, _id: int, op: WriteOp) -> None:
+        self.collections[coll.name] = coll
+        self.pending[(coll.name, _id)] = op
+        if len(self.pending) >= self.size:
+            self._kick()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.delay, self._kick)
+
+    def insert(self, coll: Any, _id: int) -> None:
+        """Make sure a document with the id exists, leaving an existing one as is."""
+        self._add(coll, _id, UpdateOne({"_id": _id}, {"$setOnInsert": {"_id": _id}}, upsert=True))
+
+    def set(self, coll: Any, _id: int, fields: dict) -> None:
+        self._add(coll, _id, UpdateOne({"_id": _id}, {"$set": fields}, upsert=True))
+
+    def delete(self, coll: Any, _id: int) -> None:
+        self._add(coll, _id, DeleteOne({"_id": _id}))
+
+    def _kick(self) -> None:
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """Write everything pending, waiting for a running flush first."""
+        if self.task and not self.task.done() and self.task is not asyncio.current_task():
+            await self.task
+        while self.pending:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            batch, self.pending = self.pending, {}
+            if not await self._write(batch):
+                # Retry on the next tick instead of spinning on a failing server.
+                if self.timer is None:
+                    self.timer = asyncio.get_running_loop().call_later(self.delay, self._kick)
+                break
+
+    async def _write(self, batch: dict[tuple[str, int], WriteOp]) -> bool:
+        grouped: dict[str, list[WriteOp]] = {}
+        for (name, _), op in batch.items():
+            grouped.setdefault(name, []).append(op)
+
+        ok = True
+        start = time.monotonic()
+        for name, ops in grouped.items():
+            try:
+                await self.collections[name].bulk_write(ops, ordered=False)
+                self.written += len(ops)
+            except Exception as ex:
+                ok = False
+                self.errors += 1
+                logger.warning(f"Buffered write to {name} failed: {type(ex).__name__}: {ex}")
+                # Requeue unless the document was written to again meanwhile.
+                for key, op in batch.items():
+                    if key[0] == name:
+                        self.pending.setdefault(key, op)
+
+        self.flushes += 1
+        self.last_time = time.monotonic() - start
+        self.total_time += self.last_time
+        self.max_time = max(self.max_time, self.last_time)
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "last_time": self.last_time,
+            "avg_time": self.total_time / self.flushes if self.flushes else 0.0,
+            "max_time": self.max_time,
+        }
@@ -0,0 +1,188 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from anony import config, logger
+
+Handler = Callable[[str, Any], Awaitable[None]]
+
+
+class Bus(ABC):
+    """
+    Invalidation bus shared by every instance running on one database.
+
+    Writers publish `(kind, key)` after changing cached data, and every other
+    instance gets the event in its handler to drop or reload that entry.
+    Events from this instance are skipped, its caches are already current.
+    Publishing never raises: the write it follows has already been done,
+    so a failure is logged and the other instances catch up on expiry.
+    """
+
+    name = "bus"
+
+    def __init__(self):
+        self.origin = uuid4().hex
+        self.handler: Handler | None = None
+        self.task: asyncio.Task | None = None
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    async def publish(self, kind: str, key: Any = None) -> None:
+        try:
+            await self._publish({"origin": self.origin, "kind": kind, "key": key})
+            self.published += 1
+        except Exception as ex:
+            self.errors += 1
+            logger.warning(f"Publishing {kind} failed: {type(ex).__name__}: {ex}")
+
+    @abstractmethod
+    async def _publish(self, event: dict) -> None: ...
+
+    def start(self, handler: Handler) -> None:
+        self.handler = handler
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _deliver(self, event: dict) -> None:
+        if event.get("origin") == self.origin or self.handler is None:
+            return
+        self.received += 1
+        try:
+            await self.handler(event["kind"], event.get("key"))
+        except Exception as ex:
+            self.errors += 1
+            logger.warning(f"Invalidation {event['kind']} failed: {type(ex).__name__}: {ex}")
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class LocalBus(Bus):
+    """
+    In-process bus: every started LocalBus stands in for one instance, so
+    several of them behave like instances sharing a database.
+    """
+
+    name = "local"
+    hub: list["LocalBus"] = []
+
+    def start(self, handler: Handler) -> None:
+        super().start(handler)
+        self.hub.append(self)
+
+    async def stop(self) -> None:
+        if self in self.hub:
+            self.hub.remove(self)
+
+    async def _publish(self, event: dict) -> None:
+        for bus in list(self.hub):
+            await bus._deliver(event)
+
+
+class PollingBus(Bus):
+    """
+    Events are documents in a collection of the storage, read by every
+    instance every `interval` seconds. Works on any storage backend that
+    several instances can share.
+    """
+
+    name = "poll"
+    retention = 3600
+
+    def __init__(self, coll, interval: float = 5.0):
+        super().__init__()
+        self.coll = coll
+        self.interval = interval
+        self.last = time.time()
+        self.seen: dict[str, float] = {}
+        self.cleaned = 0.0
+
+    async def _publish(self, event: dict) -> None:
+        now = time.time()
+        await self.coll.insert_one({"_id": uuid4().hex, **event, "ts": now})
+        if now - self.cleaned > 600:
+            self.cleaned = now
+            await self.coll.delete_many({"ts": {"$lt": now - self.retention}})
+
+    def start(self, handler: Handler) -> None:
+        super().start(handler)
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        if hasattr(self.coll, "create_index"):
+            await self.coll.create_index("ts")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._poll()
+            except Exception as ex:
+                self.errors += 1
+                logger.warning(f"Invalidation poll failed: {type(ex).__name__}: {ex}")
+
+    async def _poll(self) -> None:
+        # Look back one extra interval for events written late or by an
+        # instance whose clock is slightly behind, and skip the ones seen.
+        since = self.last - self.interval
+        events = [doc async for doc in self.coll.find({"ts": {"$gt": since}})]
+        for event in sorted(events, key=lambda e: e["ts"]):
+            if event["_id"] in self.seen:
+                continue
+            self.seen[event["_id"]] = event["ts"]
+            self.last = max(self.last, event["ts"])
+            await self._deliver(event)
+        self.last = max(self.last, time.time() - self.interval)
+        self.seen = {k: ts for k, ts in self.seen.items() if ts > since}
+
+
+class ChangeStreamBus(PollingBus):
+    """
+    Events are pushed by a Mongo change stream on the events collection.
+    Change streams need a replica set, so it falls back to polling on
+    servers that don't support them.
+    """
+
+    name = "watch"
+
+    async def _run(self) -> None:
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        try:
+            async with await self.coll.watch(pipeline) as stream:
+                async for change in stream:
+                    await self._deliver(change["fullDocument"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            logger.warning(
+                f"Change stream unavailable ({type(ex).__name__}: {ex}), polling instead."
+            )
+            self.name = "poll"
+            self.last = time.time()
+            await super()._run()
+
+
+def get_bus(storage) -> Bus:
+    if config.CACHE_BUS == "watch" and storage.name == "mongo":
+        return ChangeStreamBus(storage.events, config.CACHE_BUS_INTERVAL)
+    if config.CACHE_BUS in ("poll", "watch") and storage.name != "memory":
+        return PollingBus(storage.events, config.CACHE_BUS_INTERVAL)
+    return LocalBus()
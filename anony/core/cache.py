@@ -0,0 +1,210 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from heapq import merge
+from typing import Any, Callable, Hashable, Iterable, Iterator
+
+
+def sizeof(obj: Any) -> int:
+    """
+    Approximate memory used by an object and, one level deep, its items.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(i) for i in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(sys.getsizeof(getattr(obj, s, None)) for s in obj.__slots__)
+    elif hasattr(obj, "__dict__"):
+        size += sizeof(vars(obj))
+    return size
+
+
+class LRUCache:
+    """
+    Mapping with a size cap and an idle TTL, evicting least recently used
+    entries first. Keys for which `pinned` returns True (chats with a live
+    call) are never evicted or expired.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 10000,
+        ttl: float | None = None,
+        pinned: Callable[[Hashable], bool] | None = None,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pinned = pinned or (lambda _: False)
+        self.data: OrderedDict[Hashable, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self.data))
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self.data.get(key)
+        return entry is not None and not self._expired(key, entry)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        entry = self.data.get(key)
+        if entry is None or self._expired(key, entry):
+            raise KeyError(key)
+        self._touch(key, entry)
+        return entry[0]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.data[key] = [value, self._deadline()]
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.evict()
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self.data[key]
+
+    def _deadline(self) -> float | None:
+        return time.monotonic() + self.ttl if self.ttl else None
+
+    def _expired(self, key: Hashable, entry: list) -> bool:
+        if entry[1] is None or entry[1] > time.monotonic() or self.pinned(key):
+            return False
+        del self.data[key]
+        return True
+
+    def _touch(self, key: Hashable, entry: list) -> None:
+        entry[1] = self._deadline()
+        self.data.move_to_end(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self.data.clear()
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        return [(k, v[0]) for k, v in self.data.items()]
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits its size cap."""
+        skipped = 0
+        while len(self.data) > self.maxsize and skipped < len(self.data):
+            key = next(iter(self.data))
+            if self.pinned(key):
+                self.data.move_to_end(key)
+                skipped += 1
+                continue
+            del self.data[key]
+
+    def expire(self) -> int:
+        """Drop idle entries and return how many were removed."""
+        if not self.ttl:
+            return 0
+        now = time.monotonic()
+        expired = [
+            k for k, v in self.data.items() if v[1] <= now and not self.pinned(k)
+        ]
+        for key in expired:
+            del self.data[key]
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "entries": len(self.data),
+            "maxsize": self.maxsize,
+            "bytes": sys.getsizeof(self.data)
+            + sum(sizeof(k) + sizeof(v[0]) for k, v in self.data.items()),
+        }
+
+
+class IntSet:
+    """
+    Set of ids kept as a sorted array of 64-bit ints: O(log n) membership
+    with bisect at 8 bytes per id, against ~90 bytes per id for a list or
+    set of Python ints.
+    """
+
+    __slots__ = ("name", "data")
+
+    def __init__(self, name: str, ids: Iterable[int] = ()):
+        self.name = name
+        self.data = array("q", sorted(set(ids)))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.data)
+
+    def __contains__(self, item: int) -> bool:
+        i = bisect_left(self.data, item)
+        return i < len(self.data) and self.data[i] == item
+
+    def add(self, item: int) -> bool:
+        """Add an id, returning False if it was already present."""
+        i = bisect_left(self.data, item)
+        if i < len(self.data) and self.data[i] == item:
+            return False
+        self.data.insert(i, item)
+        return True
+
+    def discard(self, item: int) -> bool:
+        """Remove an id if present, returning whether it was."""
+        i = bisect_left(self.data, item)
+        if i < len(self.data) and self.data[i] == item:
+            del self.data[i]
+            return True
+        return False
+
+    def after(self, item: int | None, limit: int) -> list[int]:
+        """
+        Return up to `limit` ids greater than `item` (or the first ones), so
+        the set can be walked in pages that stay valid while it changes.
+        """
+        i = 0 if item is None else bisect_right(self.data, item)
+        return self.data[i : i + limit].tolist()
+
+    def update(self, ids: Iterable[int]) -> None:
+        self.merge(sorted(ids))
+
+    def merge(self, *runs: Iterable[int]) -> None:
+        """
+        Add ids from runs that are each sorted, merging them with the array
+        in one pass without building a set or list of every id.
+        """
+        data, last = array("q"), None
+        for item in merge(self.data, *runs):
+            if item != last:
+                data.append(item)
+                last = item
+        self.data = data
+
+    def clear(self) -> None:
+        self.data = array("q")
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "entries": len(self.data),
+            "maxsize": 0,
+            "bytes": sys.getsizeof(self.data),
+        }
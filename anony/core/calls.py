@@ -3,14 +3,20 @@
 # This file is part of AnonXMusic
 
 
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict
+
 from ntgcalls import ConnectionNotFound, TelegramServerError
 from pyrogram.errors import MessageIdInvalid
 from pyrogram.types import InputMediaPhoto, Message
 from pytgcalls import PyTgCalls, exceptions, types
 from pytgcalls.pytgcalls_session import PyTgCallsSession
 
-from anony import app, config, db, lang, logger, queue, userbot, yt
-from anony.helpers import Media, Track, buttons, thumb
+from anony import app, config, db, executor, lang, logger, prefetch, queue, userbot
+from anony.helpers import Media, Track, TrackInfo, buttons, thumb, utils
 
 
 class TgCall(PyTgCalls):
@@ -30,8 +36,10 @@ class TgCall(PyTgCalls):
     async def stop(self, chat_id: int) -> None:
         client = await db.get_assistant(chat_id)
         try:
+            prefetch.cancel(chat_id)
             queue.clear(chat_id)
             await db.remove_call(chat_id)
+            await db.touch_chat(chat_id)
         except:
             pass
 
@@ -41,6 +49,21 @@ class TgCall(PyTgCalls):
             pass
 
 
+    def get_stream(self, media: Media | Track, seek_time: int = 0) -> types.MediaStream:
+        return types.MediaStream(
+            media_path=media.file_path,
+            audio_parameters=types.AudioQuality.HIGH,
+            video_parameters=types.VideoQuality.HD_720p,
+            audio_flags=types.MediaStream.Flags.REQUIRED,
+            video_flags=(
+                types.MediaStream.Flags.AUTO_DETECT
+                if media.video
+                else types.MediaStream.Flags.IGNORE
+            ),
+            ffmpeg_parameters=f"-ss {seek_time}" if seek_time > 1 else None,
+        )
+
+
     async def play_media(
         self,
         chat_id: int,
@@ -50,27 +73,15 @@ class TgCall(PyTgCalls):
     ) -> None:
         client = await db.get_assistant(chat_id)
         _lang = await lang.get_lang(chat_id)
-        _thumb = (
-            await thumb.generate(media)
-            if isinstance(media, Track)
-            else config.DEFAULT_THUMB
-        )
+        if isinstance(media, Track):
+            thumb_key, _thumb = f"thumb_{media.id}", lambda: thumb.generate(media)
+        else:
+            thumb_key = _thumb = config.DEFAULT_THUMB
 
         if not media.file_path:
             return await message.edit_text(_lang["error_no_file"].format(config.SUPPORT_CHAT))
 
-        stream = types.MediaStream(
-            media_path=media.file_path,
-            audio_parameters=types.AudioQuality.HIGH,
-            video_parameters=types.VideoQuality.HD_720p,
-            audio_flags=types.MediaStream.Flags.REQUIRED,
-            video_flags=(
-                types.MediaStream.Flags.AUTO_DETECT
-                if media.video
-                else types.MediaStream.Flags.IGNORE
-            ),
-            ffmpeg_parameters=f"-ss {seek_time}" if seek_time > 1 else None,
-        )
+        stream = self.get_stream(media, seek_time)
         try:
             await client.play(
                 chat_id=chat_id,
@@ -80,6 +91,7 @@ class TgCall(PyTgCalls):
             if not seek_time:
                 media.playing = True
                 await db.add_call(chat_id)
+                await db.touch_chat(chat_id)
                 text = _lang["play_media"].format(
                     media.url,
                     media.title,
@@ -88,19 +100,27 @@ class TgCall(PyTgCalls):
                 )
                 keyboard = buttons.controls(chat_id)
                 try:
-                    await message.edit_media(
-                        media=InputMediaPhoto(
-                            media=_thumb,
-                            caption=text,
+                    await utils.send_photo(
+                        thumb_key,
+                        _thumb,
+                        lambda photo: message.edit_media(
+                            media=InputMediaPhoto(
+                                media=photo,
+                                caption=text,
+                            ),
+                            reply_markup=keyboard,
                         ),
-                        reply_markup=keyboard,
                     )
                 except MessageIdInvalid:
-                    await app.send_photo(
-                        chat_id=chat_id,
-                        photo=_thumb,
-                        caption=text,
-                        reply_markup=keyboard,
+                    await utils.send_photo(
+                        thumb_key,
+                        _thumb,
+                        lambda photo: app.send_photo(
+                            chat_id=chat_id,
+                            photo=photo,
+                            caption=text,
+                            reply_markup=keyboard,
+                        ),
                     )
         except FileNotFoundError:
             await message.edit_text(_lang["error_no_file"].format(config.SUPPORT_CHAT))
@@ -126,11 +146,15 @@ class TgCall(PyTgCalls):
         await self.play_media(chat_id, msg, media)
 
 
-    async def play_next(self, chat_id: int) -> None:
+    async def play_next(self, chat_id: int, skip: int = 1) -> None:
+        """Play the item `skip` positions after the current one."""
         if not await db.get_call(chat_id):
             return
 
+        for _ in range(skip - 1):
+            queue.get_next(chat_id)
         media = queue.get_next(chat_id)
+        prefetch.schedule(chat_id)
         try:
             if media.message_id:
                 await app.delete_messages(
@@ -148,7 +172,7 @@ class TgCall(PyTgCalls):
         _lang = await lang.get_lang(chat_id)
         msg = await app.send_message(chat_id=chat_id, text=_lang["play_next"])
         if not media.file_path:
-            media.file_path = await yt.download(media.id, video=media.video)
+            await prefetch.fetch(media)
             if not media.file_path:
                 await self.stop(chat_id)
                 return await msg.edit_text(
@@ -159,11 +183,121 @@ class TgCall(PyTgCalls):
         await self.play_media(chat_id, msg, media)
 
 
+    async def snapshot(self, path: str = "cache/snapshot.json") -> None:
+        """
+        Save the active calls with their queues, assistants and playback
+        positions so they can be resumed after a restart.
+        """
+        calls = []
+        for chat_id, playing in list(db.active_calls.items()):
+            items = queue.get_queue(chat_id)
+            if not items:
+                continue
+            calls.append(
+                {
+                    "chat_id": chat_id,
+                    "assistant": await db.get_assistant_num(chat_id),
+                    "playing": playing,
+                    "queue": [
+                        {"type": type(item).__name__, **asdict(item)}
+                        for item in items
+                    ],
+                }
+            )
+
+        if not calls:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"time": time.time(), "calls": calls}, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Saved {len(calls)} active call(s) to {path}.")
+
+
+    async def restore(self, path: str = "cache/snapshot.json", max_age: int = 600) -> None:
+        """
+        Rejoin the calls saved by `snapshot` and seek to their saved positions.
+        Snapshots older than `max_age` seconds are discarded.
+        """
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except Exception as ex:
+            logger.warning(f"Failed to read call snapshot: {ex}")
+            return
+        finally:
+            os.remove(path)
+
+        if time.time() - data.get("time", 0) > max_age:
+            return
+
+        calls = data.get("calls", [])
+        restored = await asyncio.gather(
+            *(self.restore_call(call) for call in calls), return_exceptions=True
+        )
+        logger.info(f"Restored {sum(r is True for r in restored)}/{len(calls)} call(s) from snapshot.")
+
+
+    async def restore_call(self, call: dict) -> bool:
+        """Restore one call of the snapshot. Never raises, so a bad entry
+        only loses that chat's call."""
+        chat_id = call.get("chat_id")
+        try:
+            if call["assistant"] > len(self.clients):
+                return False
+
+            await db.set_assistant(chat_id, call["assistant"])
+            for item in call["queue"]:
+                if item.pop("type") == "Track":
+                    item["info"] = TrackInfo.intern(**item["info"])
+                    queue.add(chat_id, Track(**item))
+                else:
+                    queue.add(chat_id, Media(**item))
+
+            media = queue.get_current(chat_id)
+            if not media.file_path or not os.path.exists(media.file_path):
+                if isinstance(media, Media):
+                    queue.clear(chat_id)
+                    return False
+                media.file_path = None
+                await prefetch.fetch(media)
+
+            client = await db.get_assistant(chat_id)
+            await client.play(
+                chat_id=chat_id,
+                stream=self.get_stream(media, media.time),
+                config=types.GroupCallConfig(auto_start=False),
+            )
+            await db.add_call(chat_id)
+            prefetch.schedule(chat_id)
+            if not call["playing"]:
+                await db.playing(chat_id, paused=True)
+                await client.pause(chat_id)
+            return True
+        except Exception as ex:
+            logger.warning(f"Failed to restore call in {chat_id}: {type(ex).__name__}: {ex}")
+            queue.clear(chat_id)
+            await db.remove_call(chat_id)
+            return False
+
+
     async def ping(self) -> float:
         pings = [client.ping for client in self.clients]
         return round(sum(pings) / len(pings), 2)
 
 
+    async def stream_ended(self, chat_id: int, media: Media | Track | None) -> None:
+        """
+        Move on from `media`, unless a skip or stop queued before the end of
+        the stream already did.
+        """
+        if media is not None and queue.get_current(chat_id) is media:
+            await self.play_next(chat_id)
+
     async def decorators(self, client: PyTgCalls) -> None:
         for client in self.clients:
 
@@ -171,21 +305,31 @@ class TgCall(PyTgCalls):
             async def update_handler(_, update: types.Update) -> None:
                 if isinstance(update, types.StreamEnded):
                     if update.stream_type == types.StreamEnded.Type.AUDIO:
-                        await self.play_next(update.chat_id)
+                        await executor.submit(
+                            update.chat_id,
+                            self.stream_ended,
+                            update.chat_id,
+                            queue.get_current(update.chat_id),
+                        )
                 elif isinstance(update, types.ChatUpdate):
                     if update.status in [
                         types.ChatUpdate.Status.KICKED,
                         types.ChatUpdate.Status.LEFT_GROUP,
                         types.ChatUpdate.Status.CLOSED_VOICE_CHAT,
                     ]:
-                        await self.stop(update.chat_id)
+                        await executor.submit(update.chat_id, self.stop, update.chat_id, key="stop")
+                    if update.status in [
+                        types.ChatUpdate.Status.KICKED,
+                        types.ChatUpdate.Status.LEFT_GROUP,
+                    ]:
+                        await db.rm_joined(update.chat_id)
 
 
     async def boot(self) -> None:
         PyTgCallsSession.notice_displayed = True
-        for ub in userbot.clients:
-            client = PyTgCalls(ub, cache_duration=100)
-            await client.start()
+        clients = [PyTgCalls(ub, cache_duration=100) for ub in userbot.clients]
+        await asyncio.gather(*(client.start() for client in clients))
+        for client in clients:
             self.clients.append(client)
             await self.decorators(client)
         logger.info("PyTgCalls client(s) started.")
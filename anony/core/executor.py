@@ -0,0 +1,80 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+
+@dataclass(slots=True)
+class Operation:
+    func: Callable[..., Awaitable[Any]]
+    args: tuple
+    key: str | None
+    count: bool
+    future: asyncio.Future
+    times: int = 1
+
+
+class ChatExecutor:
+    """
+    Runs the state-changing operations of each chat one at a time, in the
+    order they were submitted, while different chats run in parallel. A chat
+    only has a mailbox and a worker while it has operations waiting.
+
+    An operation submitted with a `key` coalesces with the last waiting
+    operation if it has the same key: the submitter shares its result
+    instead of queueing a copy.
+    With `count`, the function also gets how many were merged as its last
+    argument, so two skips become one skip by 2.
+
+    Only entry points (plugins, call updates, scheduled jobs) submit here.
+    The operations themselves call each other directly, since an operation
+    waiting on its own chat's mailbox would never run.
+    """
+
+    def __init__(self):
+        self.boxes: dict[int, deque[Operation]] = {}
+        self.workers: dict[int, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        chat_id: int,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        key: str | None = None,
+        count: bool = False,
+    ) -> Any:
+        box = self.boxes.setdefault(chat_id, deque())
+        # Only merge with the last waiting operation, so nothing submitted
+        # in between is overtaken.
+        if key is not None and box and box[-1].key == key:
+            op = box[-1]
+            op.times += 1
+            return await asyncio.shield(op.future)
+
+        op = Operation(func, args, key, count, asyncio.get_running_loop().create_future())
+        box.append(op)
+        if chat_id not in self.workers:
+            self.workers[chat_id] = asyncio.create_task(self._work(chat_id))
+        return await asyncio.shield(op.future)
+
+    async def _work(self, chat_id: int) -> None:
+        box = self.boxes[chat_id]
+        try:
+            while box:
+                op = box.popleft()
+                args = (*op.args, op.times) if op.count else op.args
+                try:
+                    op.future.set_result(await op.func(*args))
+                except Exception as ex:
+                    op.future.set_exception(ex)
+                    # Nobody may be waiting anymore, don't warn about it.
+                    op.future.exception()
+        finally:
+            del self.workers[chat_id]
+            if self.boxes.get(chat_id) is box and not box:
+                del self.boxes[chat_id]
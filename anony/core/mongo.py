@@ -3,47 +3,96 @@
 # This file is part of AnonXMusic
 
 
+import asyncio
+import heapq
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from random import randint
 from time import time
 
-from pymongo import AsyncMongoClient
-
-from anony import config, logger, userbot
+from anony import app, config, logger, userbot
+from anony.core.buffer import WriteBuffer
+from anony.core.bus import get_bus
+from anony.core.cache import IntSet, LRUCache
+from anony.core.storage import UpdateOne, get_storage
+
+
+@dataclass(slots=True)
+class ChatSettings:
+    """Per-chat settings, stored as one document in the settings collection."""
+
+    lang: str = "en"
+    play_mode: bool = False
+    assistant: int = 0
+    auth: set[int] = field(default_factory=set)
+
+    @classmethod
+    def from_doc(cls, doc: dict | None) -> "ChatSettings":
+        doc = doc or {}
+        return cls(
+            lang=doc.get("lang", "en"),
+            play_mode=doc.get("play_mode", False),
+            assistant=doc.get("assistant", 0),
+            auth=set(doc.get("auth", [])),
+        )
 
 
 class MongoDB:
     def __init__(self):
         """
-        Initialize the MongoDB connection.
+        Initialize the database, on the storage backend picked by DB_BACKEND.
         """
-        self.mongo = AsyncMongoClient(config.MONGO_URL, serverSelectionTimeoutMS=12500)
-        self.db = self.mongo.Anon
+        self.db = get_storage()
+        self.bus = get_bus(self.db)
+        self.writer = WriteBuffer(config.WRITE_BATCH, config.WRITE_DELAY)
 
-        self.admin_list = {}
         self.active_calls = {}
-        self.blacklisted = []
-        self.notified = []
+        self.admin_list = self._chat_cache("admins")
+        self.admin_loads: dict[int, asyncio.Task] = {}
+        self.blacklisted = IntSet("blacklisted")
+        self.notified = IntSet("notified")
         self.cache = self.db.cache
         self.logger = False
 
-        self.assistant = {}
-        self.assistantdb = self.db.assistant
-
-        self.auth = {}
-        self.authdb = self.db.auth
-
-        self.chats = []
+        self.chats = IntSet("chats")
         self.chatsdb = self.db.chats
 
-        self.lang = {}
-        self.langdb = self.db.lang
+        self.file_ids = LRUCache("file_ids", maxsize=config.CACHE_SIZE)
+        self.filesdb = self.db.files
+
+        self.joined: dict[int, OrderedDict[int, int]] = {}
+        self.backfilled: set[int] = set()
+        self.joineddb = self.db.joined
 
-        self.play_mode = []
-        self.playmodedb = self.db.play
+        self.settings = self._chat_cache("settings")
+        self.settings_loads: dict[int, asyncio.Task] = {}
+        self.settingsdb = self.db.settings
 
-        self.users = []
+        self.users = IntSet("users")
         self.usersdb = self.db.users
 
+        self.loading: dict[str, asyncio.Task] = {}
+        self.unloaded: dict[str, set[int]] = {}
+
+    def _chat_cache(self, name: str) -> LRUCache:
+        return LRUCache(
+            name,
+            maxsize=config.CACHE_SIZE,
+            ttl=config.CACHE_TTL,
+            pinned=lambda chat_id: chat_id in self.active_calls,
+        )
+
+    async def expire_caches(self) -> None:
+        for cache in self.caches():
+            cache.expire()
+
+    def caches(self) -> list[LRUCache]:
+        return [self.admin_list, self.file_ids, self.settings]
+
+    def indexes(self) -> list[IntSet]:
+        return [self.blacklisted, self.chats, self.notified, self.users]
+
     async def connect(self) -> None:
         """Check if we can connect to the database.
 
@@ -52,15 +101,19 @@ class MongoDB:
         """
         try:
             start = time()
-            await self.mongo.admin.command("ping")
-            logger.info(f"Database connection successful. ({time() - start:.2f}s)")
+            await self.db.ping()
+            logger.info(f"Database connection successful: {self.db.name} ({time() - start:.2f}s)")
             await self.load_cache()
+            self.bus.start(self.invalidate)
+            logger.info(f"Cache invalidation bus: {self.bus.name}")
         except Exception as e:
             raise SystemExit(f"Database connection failed: {type(e).__name__}") from e
 
     async def close(self) -> None:
-        """Close the connection to the database."""
-        await self.mongo.close()
+        """Flush buffered writes and close the connection to the database."""
+        await self.bus.stop()
+        await self.writer.flush()
+        await self.db.close()
         logger.info("Database connection closed.")
 
     # CACHE
@@ -78,19 +131,126 @@ class MongoDB:
             self.active_calls[chat_id] = int(not paused)
         return bool(self.active_calls[chat_id])
 
-    async def get_admins(self, chat_id: int, reload: bool = False) -> list[int]:
+    # ADMIN METHODS
+    async def get_admins(self, chat_id: int, reload: bool = False) -> set[int]:
+        """
+        Return the chat's admin ids from memory. Entries older than ADMIN_TTL
+        are still served while a refresh runs in the background, and only
+        a missing entry (or `reload`) waits for the chat members request.
+        """
+        entry = self.admin_list.get(chat_id)
+        if entry is None or reload:
+            return await asyncio.shield(self._load_admins(chat_id))
+        admins, loaded = entry
+        if time() - loaded > config.ADMIN_TTL:
+            self._load_admins(chat_id)
+        return admins
+
+    def _load_admins(self, chat_id: int) -> asyncio.Task:
+        """Start loading the chat's admins, or join the load in progress."""
+        task = self.admin_loads.get(chat_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_admins(chat_id))
+            self.admin_loads[chat_id] = task
+            task.add_done_callback(lambda _: self.admin_loads.pop(chat_id, None))
+        return task
+
+    async def _fetch_admins(self, chat_id: int) -> set[int]:
         from anony.helpers._admins import reload_admins
 
-        if chat_id not in self.admin_list or reload:
-            self.admin_list[chat_id] = await reload_admins(chat_id)
-        return self.admin_list[chat_id]
+        admins = set(await reload_admins(chat_id))
+        self.admin_list[chat_id] = (admins, time())
+        return admins
+
+    def update_admin(self, chat_id: int, user_id: int, admin: bool) -> None:
+        """Apply a promotion or demotion to the cached admins of the chat."""
+        entry = self.admin_list.get(chat_id)
+        if entry is None:
+            return
+        if admin:
+            entry[0].add(user_id)
+        else:
+            entry[0].discard(user_id)
+
+    # INVALIDATION METHODS
+    async def invalidate(self, kind: str, key=None) -> None:
+        """Drop or reload what another instance changed."""
+        if kind == "settings":
+            self.settings.pop(key)
+        elif kind == "blacklist":
+            doc = await self.cache.find_one({"_id": "bl_chats"})
+            users = await self.get_blacklisted()
+            self.blacklisted.clear()
+            self.blacklisted.update(doc.get("chat_ids", []) if doc else [])
+            app.bl_users.clear()
+            app.bl_users.update(users)
+        elif kind == "sudoers":
+            sudoers = await self.get_sudoers()
+            app.sudoers.clear()
+            app.sudoers.update([app.owner, *sudoers])
+        elif kind == "logger":
+            await self.get_logger()
+
+    # SETTINGS METHODS
+    async def get_settings(self, chat_id: int) -> ChatSettings:
+        """
+        Return the chat's settings, fetching the whole document in one query
+        the first time. Concurrent misses for a chat share that query.
+        """
+        settings = self.settings.get(chat_id)
+        if settings is None:
+            task = self.settings_loads.get(chat_id)
+            if task is None:
+                task = asyncio.create_task(self._fetch_settings(chat_id))
+                self.settings_loads[chat_id] = task
+                task.add_done_callback(lambda _: self.settings_loads.pop(chat_id, None))
+            settings = await asyncio.shield(task)
+        return settings
+
+    async def _fetch_settings(self, chat_id: int) -> ChatSettings:
+        settings = ChatSettings.from_doc(await self.settingsdb.find_one({"_id": chat_id}))
+        self.settings[chat_id] = settings
+        return settings
+
+    def recent_chats(self, limit: int) -> list[int]:
+        """Return up to `limit` chats, most recently played in first."""
+        recent = heapq.nlargest(
+            limit,
+            (
+                (last_used, chat_id)
+                for chats in self.joined.values()
+                for chat_id, last_used in chats.items()
+            ),
+        )
+        return [chat_id for _, chat_id in recent]
+
+    async def warm_settings(self, chat_ids: list[int], batch: int = 500) -> None:
+        """Load the settings of many chats with a few `$in` queries."""
+        start = time()
+        chat_ids = [c for c in chat_ids if c not in self.settings]
+        for i in range(0, len(chat_ids), batch):
+            missing = set(chat_ids[i : i + batch])
+            async for doc in self.settingsdb.find({"_id": {"$in": list(missing)}}):
+                self.settings[doc["_id"]] = ChatSettings.from_doc(doc)
+                missing.discard(doc["_id"])
+            for chat_id in missing:
+                self.settings[chat_id] = ChatSettings()
+        logger.info(f"Warmed settings of {len(chat_ids)} chats in {time() - start:.2f}s.")
+
+    async def warm_admins(self, chat_ids: list[int], rate: float) -> None:
+        """Prefetch admin lists in the background, `rate` chats per second."""
+        for chat_id in chat_ids:
+            if chat_id not in self.admin_list:
+                await self._load_admins(chat_id)
+                await asyncio.sleep(1 / rate)
+
+    async def _save_settings(self, chat_id: int, update: dict) -> None:
+        await self.settingsdb.update_one({"_id": chat_id}, update, upsert=True)
+        await self.bus.publish("settings", chat_id)
 
     # AUTH METHODS
     async def _get_auth(self, chat_id: int) -> set[int]:
-        if chat_id not in self.auth:
-            doc = await self.authdb.find_one({"_id": chat_id}) or {}
-            self.auth[chat_id] = set(doc.get("user_ids", []))
-        return self.auth[chat_id]
+        return (await self.get_settings(chat_id)).auth
 
     async def is_auth(self, chat_id: int, user_id: int) -> bool:
         return user_id in await self._get_auth(chat_id)
@@ -99,111 +259,177 @@ class MongoDB:
         users = await self._get_auth(chat_id)
         if user_id not in users:
             users.add(user_id)
-            await self.authdb.update_one(
-                {"_id": chat_id}, {"$addToSet": {"user_ids": user_id}}, upsert=True
-            )
+            await self._save_settings(chat_id, {"$addToSet": {"auth": user_id}})
 
     async def rm_auth(self, chat_id: int, user_id: int) -> None:
         users = await self._get_auth(chat_id)
         if user_id in users:
             users.discard(user_id)
-            await self.authdb.update_one(
-                {"_id": chat_id}, {"$pull": {"user_ids": user_id}}
-            )
+            await self._save_settings(chat_id, {"$pull": {"auth": user_id}})
 
     # ASSISTANT METHODS
-    async def set_assistant(self, chat_id: int) -> int:
-        num = randint(1, len(userbot.clients))
-        await self.assistantdb.update_one(
-            {"_id": chat_id},
-            {"$set": {"num": num}},
-            upsert=True,
-        )
-        self.assistant[chat_id] = num
+    async def set_assistant(self, chat_id: int, num: int | None = None) -> int:
+        num = num or randint(1, len(userbot.clients))
+        (await self.get_settings(chat_id)).assistant = num
+        await self._save_settings(chat_id, {"$set": {"assistant": num}})
         return num
 
+    async def get_assistant_num(self, chat_id: int) -> int:
+        num = (await self.get_settings(chat_id)).assistant
+        return num or await self.set_assistant(chat_id)
+
     async def get_assistant(self, chat_id: int):
         from anony import anon
 
-        if chat_id not in self.assistant:
-            doc = await self.assistantdb.find_one({"_id": chat_id})
-            num = doc["num"] if doc else await self.set_assistant(chat_id)
-            self.assistant[chat_id] = num
-
-        return anon.clients[self.assistant[chat_id] - 1]
+        return anon.clients[await self.get_assistant_num(chat_id) - 1]
 
     async def get_client(self, chat_id: int):
-        if chat_id not in self.assistant:
-            await self.get_assistant(chat_id)
         return {1: userbot.one, 2: userbot.two, 3: userbot.three}.get(
-            self.assistant[chat_id]
+            await self.get_assistant_num(chat_id)
         )
 
     # BLACKLIST METHODS
     async def add_blacklist(self, chat_id: int) -> None:
         if str(chat_id).startswith("-"):
-            self.blacklisted.append(chat_id)
-            return await self.cache.update_one(
+            self.blacklisted.add(chat_id)
+            await self.cache.update_one(
                 {"_id": "bl_chats"}, {"$addToSet": {"chat_ids": chat_id}}, upsert=True
             )
-        await self.cache.update_one(
-            {"_id": "bl_users"}, {"$addToSet": {"user_ids": chat_id}}, upsert=True
-        )
+        else:
+            await self.cache.update_one(
+                {"_id": "bl_users"}, {"$addToSet": {"user_ids": chat_id}}, upsert=True
+            )
+        await self.bus.publish("blacklist")
 
     async def del_blacklist(self, chat_id: int) -> None:
         if str(chat_id).startswith("-"):
-            self.blacklisted.remove(chat_id)
-            return await self.cache.update_one(
+            self.blacklisted.discard(chat_id)
+            await self.cache.update_one(
                 {"_id": "bl_chats"},
                 {"$pull": {"chat_ids": chat_id}},
             )
-        await self.cache.update_one(
-            {"_id": "bl_users"},
-            {"$pull": {"user_ids": chat_id}},
-        )
+        else:
+            await self.cache.update_one(
+                {"_id": "bl_users"},
+                {"$pull": {"user_ids": chat_id}},
+            )
+        await self.bus.publish("blacklist")
 
-    async def get_blacklisted(self, chat: bool = False) -> list[int]:
+    async def get_blacklisted(self, chat: bool = False) -> list[int] | IntSet:
         if chat:
             if not self.blacklisted:
                 doc = await self.cache.find_one({"_id": "bl_chats"})
-                self.blacklisted.extend(doc.get("chat_ids", []) if doc else [])
+                self.blacklisted.update(doc.get("chat_ids", []) if doc else [])
             return self.blacklisted
         doc = await self.cache.find_one({"_id": "bl_users"})
         return doc.get("user_ids", []) if doc else []
 
     # CHAT METHODS
     async def is_chat(self, chat_id: int) -> bool:
-        return chat_id in self.chats
+        return chat_id in self.chats or await self._lookup(self.chats, self.chatsdb, chat_id)
 
     async def add_chat(self, chat_id: int) -> None:
-        if not await self.is_chat(chat_id):
-            self.chats.append(chat_id)
-            await self.chatsdb.insert_one({"_id": chat_id})
+        if self.chats.add(chat_id):
+            self.writer.insert(self.chatsdb, chat_id)
 
     async def rm_chat(self, chat_id: int) -> None:
-        if await self.is_chat(chat_id):
-            self.chats.remove(chat_id)
-            await self.chatsdb.delete_one({"_id": chat_id})
+        if self._discard(self.chats, chat_id):
+            self.writer.delete(self.chatsdb, chat_id)
 
-    async def get_chats(self) -> list:
-        if not self.chats:
-            self.chats.extend([chat["_id"] async for chat in self.chatsdb.find()])
+    async def get_chats(self) -> IntSet:
+        if "chats" in self.loading:
+            await asyncio.shield(self.loading["chats"])
         return self.chats
 
-    # LANGUAGE METHODS
-    async def set_lang(self, chat_id: int, lang_code: str):
-        await self.langdb.update_one(
-            {"_id": chat_id},
-            {"$set": {"lang": lang_code}},
+    # FILE ID METHODS
+    async def get_file_id(self, key: str) -> str | None:
+        file_id = self.file_ids.get(key)
+        if file_id is None:
+            doc = await self.filesdb.find_one({"_id": key})
+            if doc:
+                file_id = self.file_ids[key] = doc["file_id"]
+        return file_id
+
+    async def set_file_id(self, key: str, file_id: str) -> None:
+        self.file_ids[key] = file_id
+        await self.filesdb.update_one(
+            {"_id": key},
+            {"$set": {"file_id": file_id}},
             upsert=True,
         )
-        self.lang[chat_id] = lang_code
+
+    async def rm_file_id(self, key: str) -> None:
+        self.file_ids.pop(key)
+        await self.filesdb.delete_one({"_id": key})
+
+    # JOINED CHAT METHODS
+    async def touch_chat(self, chat_id: int) -> None:
+        """Mark the chat as used just now by its assistant."""
+        num = await self.get_assistant_num(chat_id)
+        for n, chats in self.joined.items():
+            if n != num:
+                chats.pop(chat_id, None)
+
+        now = int(time())
+        chats = self.joined.setdefault(num, OrderedDict())
+        chats[chat_id] = now
+        chats.move_to_end(chat_id)
+        self.writer.set(self.joineddb, chat_id, {"num": num, "last_used": now})
+
+    async def rm_joined(self, chat_id: int) -> None:
+        for chats in self.joined.values():
+            chats.pop(chat_id, None)
+        self.writer.delete(self.joineddb, chat_id)
+
+    async def add_joined(self, num: int, chat_ids: list[int]) -> int:
+        """Index chats the assistant is in but never played in, as the least
+        recently used ones, and mark the assistant as backfilled. Returns how
+        many were added."""
+        known = {chat_id for chats in self.joined.values() for chat_id in chats}
+        chats = self.joined.setdefault(num, OrderedDict())
+        added = 0
+        for chat_id in chat_ids:
+            if chat_id in known:
+                continue
+            chats[chat_id] = 0
+            chats.move_to_end(chat_id, last=False)
+            self.writer.set(self.joineddb, chat_id, {"num": num, "last_used": 0})
+            added += 1
+
+        # Only mark it once the chats are saved, or a crash would lose them.
+        await self.writer.flush()
+        await self.cache.update_one(
+            {"_id": "joined_backfill"}, {"$addToSet": {"nums": num}}, upsert=True
+        )
+        self.backfilled.add(num)
+        return added
+
+    def get_idle_chats(self, num: int, idle: int, limit: int) -> list[int]:
+        """Return up to `limit` chats of the assistant that have been unused
+        for at least `idle` seconds, least recently used first."""
+        cutoff = time() - idle
+        idle_chats = []
+        for chat_id, last_used in self.joined.get(num, {}).items():
+            if last_used > cutoff or len(idle_chats) >= limit:
+                break
+            if chat_id not in self.active_calls:
+                idle_chats.append(chat_id)
+        return idle_chats
+
+    async def load_joined(self) -> None:
+        doc = await self.cache.find_one({"_id": "joined_backfill"})
+        self.backfilled = set(doc["nums"]) if doc else set()
+        async for doc in self.joineddb.find().sort("last_used", 1):
+            chats = self.joined.setdefault(doc["num"], OrderedDict())
+            chats[doc["_id"]] = doc["last_used"]
+
+    # LANGUAGE METHODS
+    async def set_lang(self, chat_id: int, lang_code: str):
+        (await self.get_settings(chat_id)).lang = lang_code
+        await self._save_settings(chat_id, {"$set": {"lang": lang_code}})
 
     async def get_lang(self, chat_id: int) -> str:
-        if chat_id not in self.lang:
-            doc = await self.langdb.find_one({"_id": chat_id})
-            self.lang[chat_id] = doc["lang"] if doc else "en"
-        return self.lang[chat_id]
+        return (await self.get_settings(chat_id)).lang
 
     # LOGGER METHODS
     async def is_logger(self) -> bool:
@@ -222,33 +448,28 @@ class MongoDB:
             {"$set": {"status": status}},
             upsert=True,
         )
+        await self.bus.publish("logger")
 
     # PLAY MODE METHODS
     async def get_play_mode(self, chat_id: int) -> bool:
-        if chat_id not in self.play_mode:
-            doc = await self.playmodedb.find_one({"_id": chat_id})
-            if doc:
-                self.play_mode.append(chat_id)
-        return chat_id in self.play_mode
+        return (await self.get_settings(chat_id)).play_mode
 
     async def set_play_mode(self, chat_id: int, remove: bool = False) -> None:
-        if remove:
-            self.play_mode.remove(chat_id)
-            await self.playmodedb.delete_one({"_id": chat_id})
-        else:
-            self.play_mode.append(chat_id)
-            await self.playmodedb.insert_one({"_id": chat_id})
+        (await self.get_settings(chat_id)).play_mode = not remove
+        await self._save_settings(chat_id, {"$set": {"play_mode": not remove}})
 
     # SUDO METHODS
     async def add_sudo(self, user_id: int) -> None:
         await self.cache.update_one(
             {"_id": "sudoers"}, {"$addToSet": {"user_ids": user_id}}, upsert=True
         )
+        await self.bus.publish("sudoers")
 
     async def del_sudo(self, user_id: int) -> None:
         await self.cache.update_one(
             {"_id": "sudoers"}, {"$pull": {"user_ids": user_id}}
         )
+        await self.bus.publish("sudoers")
 
     async def get_sudoers(self) -> list[int]:
         doc = await self.cache.find_one({"_id": "sudoers"})
@@ -256,29 +477,74 @@ class MongoDB:
 
     # USER METHODS
     async def is_user(self, user_id: int) -> bool:
-        return user_id in self.users
+        return user_id in self.users or await self._lookup(self.users, self.usersdb, user_id)
 
     async def add_user(self, user_id: int) -> None:
-        if not await self.is_user(user_id):
-            self.users.append(user_id)
-            await self.usersdb.insert_one({"_id": user_id})
+        if self.users.add(user_id):
+            self.writer.insert(self.usersdb, user_id)
 
     async def rm_user(self, user_id: int) -> None:
-        if await self.is_user(user_id):
-            self.users.remove(user_id)
-            await self.usersdb.delete_one({"_id": user_id})
+        if self._discard(self.users, user_id):
+            self.writer.delete(self.usersdb, user_id)
 
-    async def get_users(self) -> list:
-        if not self.users:
-            self.users.extend([user["_id"] async for user in self.usersdb.find()])
+    async def get_users(self) -> IntSet:
+        if "users" in self.loading:
+            await asyncio.shield(self.loading["users"])
         return self.users
 
+    # BACKGROUND LOADING
+    def stream_ids(self, index: IntSet, coll) -> None:
+        """
+        Fill the index from the collection in the background. Until it is
+        done, the index only holds ids added since boot, and lookups that
+        miss it fall back to the collection's _id index.
+        """
+        self.unloaded[index.name] = set()
+        task = asyncio.create_task(self._stream_ids(index, coll))
+        self.loading[index.name] = task
+        task.add_done_callback(lambda _: self.loading.pop(index.name, None))
+
+    async def _stream_ids(self, index: IntSet, coll) -> None:
+        start = time()
+        runs, chunk = [], array("q")
+        try:
+            async for doc in coll.find({}, {"_id": 1}, batch_size=5000):
+                chunk.append(int(doc["_id"]))
+                if len(chunk) == 5000:
+                    runs.append(array("q", sorted(chunk)))
+                    chunk = array("q")
+        except Exception as ex:
+            logger.warning(f"Failed to load {index.name}: {type(ex).__name__}: {ex}")
+        runs.append(array("q", sorted(chunk)))
+
+        # Finish the load in one step, so lookups never see it half done.
+        removed = self.unloaded.pop(index.name, set())
+        self.loading.pop(index.name, None)
+        index.merge(*((i for i in run if i not in removed) for run in runs))
+        logger.info(f"Loaded {len(index)} {index.name} in {time() - start:.2f}s.")
+
+    async def _lookup(self, index: IntSet, coll, _id: int) -> bool:
+        if index.name not in self.loading or _id in self.unloaded.get(index.name, ()):
+            return False
+        if await coll.find_one({"_id": _id}, {"_id": 1}) is None:
+            return False
+        index.add(_id)
+        return True
+
+    def _discard(self, index: IntSet, _id: int) -> bool:
+        """Remove the id, also from a load in progress that may still add it."""
+        if index.name in self.loading:
+            self.unloaded.setdefault(index.name, set()).add(_id)
+            index.discard(_id)
+            return True
+        return index.discard(_id)
+
 
     async def migrate_coll(self) -> None:
         from bson import ObjectId
         logger.info("Migrating users and chats from old collections...")
 
-        musers, mchats, done = [], [], []
+        musers, mchats, done = [], [], set()
         ulist = [user async for user in self.db.tgusersdb.find()]
         ulist.extend([user async for user in self.usersdb.find()])
 
@@ -287,13 +553,13 @@ class MongoDB:
                 user_id = int(user["user_id"])
                 if user_id in done:
                     continue
-                done.append(user_id)
+                done.add(user_id)
                 musers.append(user)
             else:
                 user_id = int(user["_id"])
                 if user_id in done:
                     continue
-                done.append(user_id)
+                done.add(user_id)
                 musers.append({"_id": user_id})
         await self.usersdb.drop()
         await self.db.tgusersdb.drop()
@@ -305,13 +571,13 @@ class MongoDB:
                 chat_id = int(chat["chat_id"])
                 if chat_id in mchats:
                     continue
-                done.append(chat_id)
+                done.add(chat_id)
                 mchats.append(chat)
             else:
                 chat_id = int(chat["_id"])
                 if chat_id in done:
                     continue
-                done.append(chat_id)
+                done.add(chat_id)
                 mchats.append({"_id": chat_id})
         await self.chatsdb.drop()
         if mchats:
@@ -320,13 +586,37 @@ class MongoDB:
         await self.cache.insert_one({"_id": "migrated"})
         logger.info("Migration completed.")
 
+    async def migrate_settings(self) -> None:
+        """Merge the old per-setting collections into one document per chat."""
+        logger.info("Migrating chat settings...")
+        chats: dict[int, dict] = {}
+        async for doc in self.db.lang.find():
+            chats.setdefault(doc["_id"], {})["lang"] = doc["lang"]
+        async for doc in self.db.play.find():
+            chats.setdefault(doc["_id"], {})["play_mode"] = True
+        async for doc in self.db.assistant.find():
+            chats.setdefault(doc["_id"], {})["assistant"] = doc["num"]
+        async for doc in self.db.auth.find():
+            chats.setdefault(doc["_id"], {})["auth"] = doc.get("user_ids", [])
+
+        ops = [UpdateOne({"_id": k}, {"$set": v}, upsert=True) for k, v in chats.items()]
+        for i in range(0, len(ops), 1000):
+            await self.settingsdb.bulk_write(ops[i : i + 1000], ordered=False)
+        await self.cache.insert_one({"_id": "settings_migrated"})
+        logger.info(f"Migrated settings of {len(chats)} chats.")
+
     async def load_cache(self) -> None:
         doc = await self.cache.find_one({"_id": "migrated"})
         if not doc:
             await self.migrate_coll()
 
-        await self.get_chats()
-        await self.get_users()
+        self.stream_ids(self.chats, self.chatsdb)
+        self.stream_ids(self.users, self.usersdb)
+        if not await self.cache.find_one({"_id": "settings_migrated"}):
+            await self.migrate_settings()
+
         await self.get_blacklisted(True)
         await self.get_logger()
+        await self.load_joined()
+        await self.warm_settings(self.recent_chats(config.WARM_CHATS))
         logger.info("Database cache loaded.")
@@ -0,0 +1,193 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import os
+from pathlib import Path
+
+from anony import config, db, logger, queue, yt
+from anony.helpers import Media, Track, thumb
+
+MediaItem = Media | Track
+
+
+class Prefetcher:
+    """
+    Keeps the next few tracks of every queue downloaded, with their thumbnails
+    rendered, ahead of playback.
+
+    Downloads are shared by every chat that queued the same track, limited by
+    a global concurrency budget and a disk budget for the downloads folder,
+    and cancelled once no queue wants the track anymore. A track that is
+    about to play skips the concurrency budget, even if it was queued
+    behind it as a prefetch.
+    """
+
+    def __init__(self):
+        self.depth = config.PREFETCH_DEPTH
+        self.disk_limit = config.DOWNLOADS_LIMIT * 1024**2
+        self.limit = asyncio.Semaphore(config.PREFETCH_WORKERS)
+        self.tasks: dict[tuple[str, bool], asyncio.Task] = {}
+        # Background downloads still waiting for a slot.
+        self.waiting: set[tuple[str, bool]] = set()
+        self.wanted: dict[tuple[str, bool], set[int]] = {}
+        self.chats: dict[int, set[tuple[str, bool]]] = {}
+
+    @staticmethod
+    def _key(media: Track) -> tuple[str, bool]:
+        return media.id, media.video
+
+    def schedule(self, chat_id: int) -> None:
+        """
+        Sync the chat's prefetch set with the head of its queue: start work for
+        tracks that entered the horizon and release the ones that left it.
+        """
+        items = [
+            m for m in queue.get_queue(chat_id)[: self.depth + 1]
+            if isinstance(m, Track)
+        ]
+        wanted = {self._key(m) for m in items}
+        for key in self.chats.get(chat_id, set()) - wanted:
+            self._release(chat_id, key)
+
+        for pos, media in enumerate(items):
+            key = self._key(media)
+            self.wanted.setdefault(key, set()).add(chat_id)
+            if media.file_path:
+                continue
+            if key not in self.tasks:
+                self._start(media, foreground=pos == 0)
+            elif pos == 0:
+                self._promote(media)
+
+        if wanted:
+            self.chats[chat_id] = wanted
+        else:
+            self.chats.pop(chat_id, None)
+
+    def cancel(self, chat_id: int) -> None:
+        """Release everything prefetched for the chat."""
+        for key in self.chats.pop(chat_id, set()):
+            self._release(chat_id, key)
+
+    def _release(self, chat_id: int, key: tuple[str, bool]) -> None:
+        chats = self.wanted.get(key)
+        if chats is None:
+            return
+        chats.discard(chat_id)
+        if chats:
+            return
+        del self.wanted[key]
+        task = self.tasks.pop(key, None)
+        if task and not task.done():
+            task.cancel()
+
+    def _start(self, media: Track, foreground: bool = False) -> asyncio.Task:
+        key = self._key(media)
+        task = asyncio.create_task(self._fetch(media, foreground))
+        self.tasks[key] = task
+        task.add_done_callback(
+            lambda t: self.tasks.pop(key) if self.tasks.get(key) is t else None
+        )
+        return task
+
+    def _promote(self, media: Track) -> asyncio.Task | None:
+        """
+        Restart a background download still waiting for a slot in the
+        foreground. Returns the new task, if any.
+        """
+        key = self._key(media)
+        if key not in self.waiting:
+            return None
+        self.waiting.discard(key)
+        self.tasks[key].cancel()
+        return self._start(media, foreground=True)
+
+    async def _fetch(self, media: Track, foreground: bool) -> str | None:
+        key = self._key(media)
+        if foreground:
+            path = await self._download(media)
+        else:
+            self.waiting.add(key)
+            try:
+                async with self.limit:
+                    self.waiting.discard(key)
+                    path = await self._download(media)
+            finally:
+                if self.tasks.get(key) is asyncio.current_task():
+                    self.waiting.discard(key)
+        if not path:
+            return None
+
+        for chat_id in self.wanted.get(self._key(media), ()):
+            for item in queue.get_queue(chat_id)[: self.depth + 1]:
+                if (
+                    isinstance(item, Track)
+                    and not item.file_path
+                    and self._key(item) == self._key(media)
+                ):
+                    item.file_path = path
+        if not foreground and not await db.get_file_id(f"thumb_{media.id}"):
+            thumb.prerender(media)
+        return path
+
+    async def _download(self, media: Track) -> str | None:
+        if self.disk_limit:
+            in_use = {
+                str(Path(item.file_path))
+                for chat_queue in queue.queues.values()
+                for item in chat_queue
+                if item.file_path
+            }
+            await asyncio.to_thread(self._ensure_space, in_use)
+        return await yt.download(media.id, video=media.video)
+
+    async def fetch(self, media: MediaItem) -> str | None:
+        """
+        Return the media's file, joining a running prefetch of the same track
+        instead of downloading it a second time.
+        """
+        if media.file_path or not isinstance(media, Track):
+            return media.file_path
+
+        key = self._key(media)
+        task = self._promote(media) or self.tasks.get(key) or self._start(media, True)
+        while True:
+            try:
+                media.file_path = await asyncio.shield(task)
+                break
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            # Join the download that replaced it, e.g. when another chat
+            # promoted it, or download it here if there is none.
+            retry = self.tasks.get(key)
+            if retry is None or retry is task or key in self.waiting:
+                media.file_path = await yt.download(media.id, video=media.video)
+                break
+            task = retry
+        return media.file_path
+
+    def _ensure_space(self, in_use: set[str]) -> None:
+        """
+        Delete the least recently used downloads that no queue refers to until
+        the downloads folder fits the disk budget.
+        """
+        files = [f for f in os.scandir("downloads") if f.is_file()]
+        total = sum(f.stat().st_size for f in files)
+        if total <= self.disk_limit:
+            return
+
+        for f in sorted(files, key=lambda f: f.stat().st_atime):
+            if total <= self.disk_limit:
+                break
+            if str(Path(f.path)) in in_use or f.name.endswith(".part"):
+                continue
+            try:
+                size = f.stat().st_size
+                os.remove(f.path)
+                total -= size
+            except OSError as ex:
+                logger.warning(f"Failed to remove {f.path}: {ex}")
@@ -0,0 +1,131 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import time
+
+from anony import config
+from anony.core.cache import LRUCache
+
+
+class TokenBucket:
+    """
+    Token bucket: refills `rate` tokens per second up to `burst`, and each
+    call takes `cost` tokens. `pause` empties it for a while, e.g. for the
+    duration of a FloodWait, holding back every caller sharing it.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "lock")
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock: asyncio.Lock | None = None
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait(self, cost: float = 1) -> float:
+        """Return the seconds until `cost` tokens are available, taking none."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate + max(self.updated - now, 0.0)
+
+    def try_acquire(self, cost: float = 1) -> float:
+        """
+        Take `cost` tokens if available and return 0, otherwise take nothing
+        and return the seconds until they will be.
+        """
+        wait = self.wait(cost)
+        if not wait:
+            self.tokens -= cost
+        return wait
+
+    async def acquire(self, cost: float = 1) -> None:
+        """Wait for `cost` tokens, serving waiters in order."""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while wait := self.try_acquire(cost):
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next `seconds`."""
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+class Admission:
+    """
+    Admission control for expensive requests: token buckets per user, per
+    chat and for the whole bot, refilled by a minute's worth of tokens over
+    a minute. Requests are weighted by what they are expected to cost, and
+    only admitted when every bucket involved can pay for them.
+
+    Inline searches have a bucket per user of their own, so typing a query
+    doesn't use up the tokens of the plays it leads to.
+    """
+
+    COSTS = {"search": 1, "cached": 1, "download": 3, "video": 6, "playlist": 8}
+
+    def __init__(self):
+        self.user_rate = config.ADMIT_USER
+        self.chat_rate = config.ADMIT_CHAT
+        self.users = LRUCache("admit_users", maxsize=config.CACHE_SIZE, ttl=3600)
+        self.chats = LRUCache("admit_chats", maxsize=config.CACHE_SIZE, ttl=3600)
+        self.inline_rate = config.ADMIT_INLINE
+        self.inline = LRUCache("admit_inline", maxsize=config.CACHE_SIZE, ttl=3600)
+        self.all = None
+        if config.ADMIT_GLOBAL:
+            self.all = TokenBucket(config.ADMIT_GLOBAL / 60, config.ADMIT_GLOBAL)
+        self.admitted = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _bucket(cache: LRUCache, key: int, per_minute: int) -> TokenBucket | None:
+        if not per_minute:
+            return None
+        bucket = cache.get(key)
+        if bucket is None:
+            bucket = cache[key] = TokenBucket(per_minute / 60, per_minute)
+        return bucket
+
+    def admit(self, cost: float, user_id: int, chat_id: int | None = None) -> int:
+        """
+        Charge `cost` to the user, the chat and the global bucket. Returns 0
+        if admitted, otherwise the seconds to wait, charging nothing.
+        """
+        return self._charge(
+            cost,
+            self._bucket(self.users, user_id, self.user_rate),
+            self._bucket(self.chats, chat_id, self.chat_rate) if chat_id else None,
+            self.all,
+        )
+
+    def admit_inline(self, user_id: int) -> int:
+        """Charge an inline search to the user's inline bucket, like `admit`."""
+        return self._charge(
+            self.COSTS["search"], self._bucket(self.inline, user_id, self.inline_rate)
+        )
+
+    def _charge(self, cost: float, *buckets: TokenBucket | None) -> int:
+        buckets = [b for b in buckets if b]
+        wait = max((b.wait(min(cost, b.burst)) for b in buckets), default=0.0)
+        if wait:
+            self.rejected += 1
+            return max(int(wait + 0.999), 1)
+        for bucket in buckets:
+            bucket.try_acquire(min(cost, bucket.burst))
+        self.admitted += 1
+        return 0
+
+    def stats(self) -> dict:
+        return {"admitted": self.admitted, "rejected": self.rejected}
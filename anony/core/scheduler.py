@@ -0,0 +1,224 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable
+
+from anony import db, logger
+
+
+class Job:
+    """
+    A scheduled job along with its run statistics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        interval: float = 0,
+        per_chat: bool = False,
+        args: tuple = (),
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.per_chat = per_chat
+        self.args = args
+        self.next_run = 0.0
+        self.cancelled = False
+        self.running = False
+
+        self.runs = 0
+        self.skipped = 0
+        self.missed = 0
+        self.errors = 0
+        self.last_time = 0.0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "missed": self.missed,
+            "errors": self.errors,
+            "last_time": self.last_time,
+            "avg_time": self.total_time / self.runs if self.runs else 0.0,
+            "max_time": self.max_time,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+
+class Scheduler:
+    """
+    Heap based scheduler for the bot's background maintenance work.
+
+    Periodic jobs are rescheduled from their previous deadline, not from the
+    time they finished, so they don't drift. A job is never started again
+    while its previous run is still going; such ticks are counted as skipped.
+    Per-chat jobs that fall due together share one pass over the active calls,
+    running one after the other for each chat.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self.heap: list[tuple[float, int, Job]] = []
+        self.counter = itertools.count()
+        self.running: set[asyncio.Task] = set()
+        self.task: asyncio.Task | None = None
+        self.wakeup: asyncio.Event | None = None
+
+    def every(
+        self,
+        interval: float,
+        func: Callable[..., Awaitable[Any]],
+        name: str = None,
+        per_chat: bool = False,
+        delay: float = None,
+    ) -> Job:
+        """
+        Run `func` every `interval` seconds. Per-chat jobs are called once for
+        each active call with the chat id as the only argument.
+        """
+        job = Job(name or func.__name__, func, interval, per_chat)
+        return self._push(job, time.monotonic() + (interval if delay is None else delay))
+
+    def call_later(
+        self, delay: float, func: Callable[..., Awaitable[Any]], *args, name: str = None
+    ) -> Job:
+        """
+        Run `func(*args)` once after `delay` seconds. Scheduling a job with the
+        name of a pending one replaces it, which suits per-chat deadlines.
+        """
+        job = Job(name or func.__name__, func, args=args)
+        return self._push(job, time.monotonic() + delay)
+
+    def cancel(self, name: str) -> None:
+        job = self.jobs.pop(name, None)
+        if job:
+            job.cancelled = True
+
+    def _push(self, job: Job, when: float) -> Job:
+        self.cancel(job.name)
+        job.next_run = when
+        self.jobs[job.name] = job
+        heapq.heappush(self.heap, (when, next(self.counter), job))
+        if self.wakeup:
+            self.wakeup.set()
+        return job
+
+    def start(self) -> asyncio.Task:
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._loop())
+        return self.task
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self.task, *self.running] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                scheduled, _, job = heapq.heappop(self.heap)
+                if job.cancelled:
+                    continue
+                due.append((job, scheduled))
+                if job.interval:
+                    missed = int((now - scheduled) // job.interval)
+                    job.missed += missed
+                    job.next_run = scheduled + (missed + 1) * job.interval
+                    heapq.heappush(self.heap, (job.next_run, next(self.counter), job))
+                else:
+                    self.jobs.pop(job.name, None)
+
+            if due:
+                self._dispatch(due, now)
+
+            timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, due: list[tuple[Job, float]], now: float) -> None:
+        per_chat = []
+        for job, scheduled in due:
+            if job.running:
+                job.skipped += 1
+                continue
+            self._begin(job, scheduled)
+            if job.per_chat:
+                per_chat.append(job)
+            else:
+                self._spawn(self._run(job))
+        if per_chat:
+            self._spawn(self._run_chats(per_chat, list(db.active_calls)))
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.create_task(coro)
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    @staticmethod
+    def _begin(job: Job, scheduled: float) -> None:
+        job.running = True
+        job.last_lag = time.monotonic() - scheduled
+        job.max_lag = max(job.max_lag, job.last_lag)
+        job.last_time = 0.0
+
+    @staticmethod
+    def _end(job: Job) -> None:
+        job.running = False
+        job.runs += 1
+        job.total_time += job.last_time
+        job.max_time = max(job.max_time, job.last_time)
+
+    async def _run(self, job: Job) -> None:
+        start = time.monotonic()
+        try:
+            await job.func(*job.args)
+        except Exception as ex:
+            job.errors += 1
+            logger.warning(f"Job {job.name} failed: {type(ex).__name__}: {ex}")
+        finally:
+            job.last_time = time.monotonic() - start
+            self._end(job)
+
+    async def _run_chats(self, jobs: list[Job], chats: list[int]) -> None:
+        """Run the due per-chat jobs in one pass, all of them for each chat
+        in turn. Each job's time is what its own calls took."""
+        try:
+            for chat_id in chats:
+                for job in jobs:
+                    if chat_id not in db.active_calls:
+                        break
+                    start = time.monotonic()
+                    try:
+                        await job.func(chat_id)
+                    except Exception as ex:
+                        job.errors += 1
+                        logger.debug(f"Job {job.name} failed for {chat_id}: {ex}")
+                    finally:
+                        job.last_time += time.monotonic() - start
+        finally:
+            for job in jobs:
+                self._end(job)
+
+    def stats(self) -> list[dict]:
+        return [job.stats() for job in self.jobs.values()]
@@ -0,0 +1,54 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import time
+from contextlib import contextmanager
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+class Startup:
+    """
+    Timings of the boot stages, relative to the start of the process.
+    Stages may overlap, so each one keeps its own offset and duration.
+    """
+
+    def __init__(self, origin: float):
+        self.origin = origin
+        self.stages: dict[str, tuple[float, float]] = {}
+        self.ready = 0.0
+
+    def record(self, name: str, start: float, end: float | None = None) -> None:
+        end = end or time.time()
+        self.stages[name] = (start - self.origin, end - start)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    async def run(self, name: str, coro: Awaitable[T]) -> T:
+        with self.stage(name):
+            return await coro
+
+    def done(self) -> float:
+        self.ready = time.time() - self.origin
+        return self.ready
+
+    def stats(self) -> list[dict]:
+        return [
+            {"name": name, "offset": offset, "time": took}
+            for name, (offset, took) in sorted(self.stages.items(), key=lambda s: s[1][0])
+        ]
+
+    def report(self) -> str:
+        lines = [f"Ready in {self.ready:.2f}s:"]
+        for stage in self.stats():
+            lines.append(f"  {stage['name']:<12} +{stage['offset']:.2f}s  {stage['time']:.2f}s")
+        return "\n".join(lines)
@@ -0,0 +1,439 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+
+import asyncio
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+from anony import config
+
+T = TypeVar("T")
+
+@dataclass(slots=True)
+class UpdateOne:
+    filter: dict
+    update: dict
+    upsert: bool = False
+
+
+@dataclass(slots=True)
+class ReplaceOne:
+    filter: dict
+    replacement: dict = field(default_factory=dict)
+    upsert: bool = False
+
+
+@dataclass(slots=True)
+class DeleteOne:
+    filter: dict
+
+
+WriteOp = UpdateOne | ReplaceOne | DeleteOne
+
+
+def match(doc: dict, query: dict) -> bool:
+    """Match a document against the equality, `$in`, `$gt` and `$lt` filters we use."""
+    for key, cond in query.items():
+        value = doc.get(key)
+        if not isinstance(cond, dict):
+            if value != cond:
+                return False
+            continue
+        if "$in" in cond and value not in cond["$in"]:
+            return False
+        if "$gt" in cond and (value is None or value <= cond["$gt"]):
+            return False
+        if "$lt" in cond and (value is None or value >= cond["$lt"]):
+            return False
+    return True
+
+
+def apply_update(doc: dict, update: dict, insert: bool = False) -> None:
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and insert):
+            doc.update(fields)
+        elif op == "$addToSet":
+            for key, value in fields.items():
+                values = doc.setdefault(key, [])
+                if value not in values:
+                    values.append(value)
+        elif op == "$pull":
+            for key, value in fields.items():
+                if key in doc:
+                    doc[key] = [v for v in doc[key] if v != value]
+        elif op != "$setOnInsert":
+            raise ValueError(f"Unsupported update operator: {op}")
+
+
+def project(doc: dict, projection: dict | None) -> dict:
+    """Apply a Mongo projection of top level fields, either all included or all excluded."""
+    if not projection:
+        return doc
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(fields.values()) or (not fields and projection.get("_id", 1)):
+        out = {k: doc[k] for k in fields if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    hidden = set(fields) | ({"_id"} if not projection.get("_id", 1) else set())
+    return {k: v for k, v in doc.items() if k not in hidden}
+
+
+class Cursor:
+    """
+    Async iterator over query results, with Mongo's `sort`. Documents are
+    read from the collection in batches.
+    """
+
+    batch = 500
+
+    def __init__(self, coll: "LocalCollection", query: dict | None, projection: dict | None):
+        self.coll = coll
+        self.query = query
+        self.projection = projection
+        self.order: tuple[str, int] | None = None
+
+    def sort(self, key: str, direction: int = 1) -> "Cursor":
+        self.order = (key, direction)
+        return self
+
+    def _read(self) -> Iterator[dict]:
+        docs = self.coll._find(self.query)
+        if self.order:
+            key, direction = self.order
+            docs = iter(sorted(docs, key=lambda d: d.get(key), reverse=direction < 0))
+        return (project(doc, self.projection) for doc in docs)
+
+    async def __aiter__(self) -> AsyncIterator[dict]:
+        docs = await self.coll._run(self._read)
+        while chunk := await self.coll._run(lambda: list(islice(docs, self.batch))):
+            for doc in chunk:
+                yield doc
+
+
+class LocalCollection(ABC):
+    """
+    The subset of a Mongo collection used by the bot, on top of a simple
+    key/value store of documents. Subclasses provide the store.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking operation on the store."""
+        return func(*args)
+
+    # Storage primitives.
+    @abstractmethod
+    def _get(self, _id: Any) -> dict | None: ...
+
+    def _get_many(self, ids: list) -> Iterator[dict]:
+        for _id in ids:
+            doc = self._get(_id)
+            if doc is not None:
+                yield doc
+
+    @abstractmethod
+    def _all(self) -> Iterator[dict]: ...
+
+    @abstractmethod
+    def _put(self, doc: dict) -> None: ...
+
+    @abstractmethod
+    def _delete(self, _id: Any) -> None: ...
+
+    @abstractmethod
+    def _clear(self) -> None: ...
+
+    @abstractmethod
+    def _batch(self): ...
+
+    # Query helpers.
+    def _find(self, query: dict | None) -> Iterator[dict]:
+        query = query or {}
+        _id = query.get("_id")
+        # Look plain ids up directly, anything else is matched on every document.
+        if len(query) == 1 and _id is not None:
+            if not isinstance(_id, dict):
+                doc = self._get(_id)
+                return iter([doc] if doc is not None else [])
+            if set(_id) == {"$in"}:
+                return self._get_many(list(_id["$in"]))
+        return (doc for doc in self._all() if match(doc, query))
+
+    def _write(self, op: WriteOp) -> None:
+        doc = next(self._find(op.filter), None)
+        if isinstance(op, DeleteOne):
+            if doc is not None:
+                self._delete(doc["_id"])
+            return
+
+        insert = doc is None
+        if insert:
+            if not op.upsert:
+                return
+            doc = {k: v for k, v in op.filter.items() if not isinstance(v, dict)}
+        if isinstance(op, ReplaceOne):
+            doc = {"_id": doc["_id"], **op.replacement}
+        else:
+            apply_update(doc, op.update, insert)
+        self._put(doc)
+
+    def _insert(self, docs: list[dict]) -> None:
+        with self._batch():
+            for doc in docs:
+                if self._get(doc["_id"]) is not None:
+                    raise ValueError(f"Duplicate key {doc['_id']!r} in {self.name}")
+                self._put(dict(doc))
+
+    def _write_many(self, ops: list[WriteOp]) -> None:
+        with self._batch():
+            for op in ops:
+                self._write(op)
+
+    def _delete_many(self, query: dict) -> None:
+        with self._batch():
+            for doc in list(self._find(query)):
+                self._delete(doc["_id"])
+
+    def _find_one(self, query: dict | None, projection: dict | None) -> dict | None:
+        doc = next(self._find(query), None)
+        return project(doc, projection) if doc is not None else None
+
+    # Collection API.
+    async def find_one(self, query: dict | None = None, projection: dict | None = None) -> dict | None:
+        return await self._run(self._find_one, query, projection)
+
+    def find(self, query: dict | None = None, projection: dict | None = None, **_) -> Cursor:
+        return Cursor(self, query, projection)
+
+    async def insert_one(self, doc: dict) -> None:
+        await self._run(self._insert, [doc])
+
+    async def insert_many(self, docs: list[dict]) -> None:
+        await self._run(self._insert, docs)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> None:
+        await self._run(self._write, UpdateOne(query, update, upsert))
+
+    async def delete_one(self, query: dict) -> None:
+        await self._run(self._write, DeleteOne(query))
+
+    async def delete_many(self, query: dict) -> None:
+        await self._run(self._delete_many, query)
+
+    async def bulk_write(self, ops: list[WriteOp], ordered: bool = True) -> None:
+        await self._run(self._write_many, ops)
+
+    async def drop(self) -> None:
+        await self._run(self._clear)
+
+
+class MemoryCollection(LocalCollection):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.docs: dict[Any, dict] = {}
+
+    def _get(self, _id: Any) -> dict | None:
+        doc = self.docs.get(_id)
+        return dict(doc) if doc is not None else None
+
+    def _all(self) -> Iterator[dict]:
+        return (dict(doc) for doc in list(self.docs.values()))
+
+    def _put(self, doc: dict) -> None:
+        self.docs[doc["_id"]] = doc
+
+    def _delete(self, _id: Any) -> None:
+        self.docs.pop(_id, None)
+
+    def _clear(self) -> None:
+        self.docs.clear()
+
+    def _batch(self):
+        return nullcontext()
+
+
+class SQLiteCollection(LocalCollection):
+    """
+    Documents stored as JSON in a table keyed by the JSON encoded _id, so
+    int and str ids stay distinct.
+
+    Operations run in a worker thread so queries don't block the event
+    loop, one at a time per connection so batches stay in one transaction.
+    """
+
+    def __init__(self, name: str, conn: sqlite3.Connection, lock: threading.Lock):
+        super().__init__(name)
+        self.conn = conn
+        self.lock = lock
+        self.table = f'"{name}"'
+        with lock:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        return await asyncio.to_thread(self._locked, func, *args)
+
+    def _locked(self, func: Callable[..., T], *args) -> T:
+        with self.lock:
+            return func(*args)
+
+    def _get(self, _id: Any) -> dict | None:
+        row = self.conn.execute(
+            f"SELECT doc FROM {self.table} WHERE id = ?", (json.dumps(_id),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _get_many(self, ids: list) -> Iterator[dict]:
+        for i in range(0, len(ids), 500):
+            keys = [json.dumps(_id) for _id in ids[i : i + 500]]
+            rows = self.conn.execute(
+                f"SELECT doc FROM {self.table} WHERE id IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            yield from (json.loads(row[0]) for row in rows)
+
+    def _all(self) -> Iterator[dict]:
+        return (json.loads(row[0]) for row in self.conn.execute(f"SELECT doc FROM {self.table}"))
+
+    def _put(self, doc: dict) -> None:
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (id, doc) VALUES (?, ?)",
+            (json.dumps(doc["_id"]), json.dumps(doc)),
+        )
+
+    def _delete(self, _id: Any) -> None:
+        self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (json.dumps(_id),))
+
+    def _clear(self) -> None:
+        self.conn.execute(f"DELETE FROM {self.table}")
+
+    @contextmanager
+    def _batch(self):
+        """Run the writes in one transaction, unless one is already open."""
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+
+class MongoCollection:
+    """
+    Native async Mongo collection, with bulk writes taking the storage ops.
+    """
+
+    def __init__(self, coll):
+        self.coll = coll
+
+    def __getattr__(self, name: str):
+        return getattr(self.coll, name)
+
+    async def bulk_write(self, ops: list[WriteOp], ordered: bool = True):
+        import pymongo
+
+        requests = []
+        for op in ops:
+            if isinstance(op, UpdateOne):
+                requests.append(pymongo.UpdateOne(op.filter, op.update, upsert=op.upsert))
+            elif isinstance(op, ReplaceOne):
+                requests.append(pymongo.ReplaceOne(op.filter, op.replacement, upsert=op.upsert))
+            else:
+                requests.append(pymongo.DeleteOne(op.filter))
+        return await self.coll.bulk_write(requests, ordered=ordered)
+
+
+class Storage(ABC):
+    """
+    A database: collections are created on first access, as `db.<name>`.
+    """
+
+    name = "storage"
+
+    def __init__(self):
+        self.collections: dict[str, Any] = {}
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        coll = self.collections.get(name)
+        if coll is None:
+            coll = self.collections[name] = self.collection(name)
+        return coll
+
+    @abstractmethod
+    def collection(self, name: str): ...
+
+    async def ping(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self, url: str):
+        super().__init__()
+        from pymongo import AsyncMongoClient
+
+        self.client = AsyncMongoClient(url, serverSelectionTimeoutMS=12500)
+        self.db = self.client.Anon
+
+    def collection(self, name: str) -> MongoCollection:
+        return MongoCollection(self.db[name])
+
+    async def ping(self) -> None:
+        await self.client.admin.command("ping")
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.lock = threading.Lock()
+
+    def collection(self, name: str) -> SQLiteCollection:
+        return SQLiteCollection(name, self.conn, self.lock)
+
+    async def ping(self) -> None:
+        await asyncio.to_thread(self.conn.execute, "SELECT 1")
+
+    async def close(self) -> None:
+        self.conn.close()
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def collection(self, name: str) -> MemoryCollection:
+        return MemoryCollection(name)
+
+
+def get_storage() -> Storage:
+    if config.DB_BACKEND == "sqlite":
+        return SQLiteStorage(config.DB_PATH)
+    if config.DB_BACKEND == "memory":
+        return MemoryStorage()
+    return MongoStorage(config.MONGO_URL)
@@ -3,6 +3,8 @@
 # This file is part of AnonXMusic
 
 
+import asyncio
+
 from pyrogram import Client
 
 from anony import config, logger
@@ -66,14 +68,16 @@ class Userbot(Client):
 
     async def boot(self):
         """
-        Asynchronously starts the assistants.
+        Asynchronously starts the assistants, all at once.
         """
-        if config.SESSION1:
-            await self.boot_client(1, self.one)
-        if config.SESSION2:
-            await self.boot_client(2, self.two)
-        if config.SESSION3:
-            await self.boot_client(3, self.three)
+        sessions = [
+            (num, client)
+            for num, client in ((1, self.one), (2, self.two), (3, self.three))
+            if getattr(config, f"SESSION{num}")
+        ]
+        await asyncio.gather(*(self.boot_client(num, ub) for num, ub in sessions))
+        # Keep the clients in session order whichever started first.
+        self.clients = [client for _, client in sessions]
 
     async def exit(self):
         """
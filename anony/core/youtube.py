@@ -5,14 +5,13 @@ import asyncio
 from pathlib import Path
 from typing import Optional, Union
 
-import yt_dlp
 from py_yt import VideosSearch
 from pyrogram import enums, types
 import aiohttp
 import aiofiles
 
 from anony import config, logger
-from anony.helpers import Track, utils
+from anony.helpers import Track, TrackInfo, utils
 
 
 class YouTube:
@@ -78,18 +77,17 @@ class YouTube:
         results = await _search.next()
         if results and results.get("result"):
             data = results["result"][0]
-            return Track(
+            info = TrackInfo.intern(
                 id=data.get("id"),
                 channel_name=data.get("channel", {}).get("name"),
                 duration=data.get("duration"),
                 duration_sec=utils.to_seconds(data.get("duration")),
-                message_id=m_id,
                 title=(data.get("title") or "")[:25],
                 thumbnail=(data.get("thumbnails", [{}])[-1].get("url") or "").split("?")[0],
                 url=data.get("link"),
                 view_count=data.get("viewCount", {}).get("short") if data.get("viewCount") else None,
-                video=video,
             )
+            return Track(info=info, message_id=m_id, video=video)
         return None
 
     async def playlist(self, limit: int, url: str) -> list[str]:
@@ -103,6 +101,8 @@ class YouTube:
             "playlistend": limit,
         }
         try:
+            import yt_dlp
+
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False) or {}
                 for entry in info.get("entries", []):
@@ -125,7 +125,7 @@ class YouTube:
                         return await resp.json()
                     logger.warning("YT API returned %s for %s", resp.status, url)
                         # in case of soft failure
-            except (asyncio.TimeoutError, aiohttp.ClientError, asyncio.CancelledError):
+            except (asyncio.TimeoutError, aiohttp.ClientError):
                 if attempt < retries:
                     await asyncio.sleep(1.5 * (attempt + 1))
                     continue
@@ -147,23 +147,40 @@ class YouTube:
                             await f.write(chunk)
                     tmp.replace(path)
                     return True
-            except (asyncio.TimeoutError, aiohttp.ClientError, asyncio.CancelledError):
+            except asyncio.CancelledError:
+                tmp.unlink(missing_ok=True)
+                raise
+            except (asyncio.TimeoutError, aiohttp.ClientError):
                 if attempt < 2:
                     await asyncio.sleep(2 * (attempt + 1))
                     continue
             break
         return False
 
+    def _file_id(self, provided: str) -> str:
+        extracted_id = self.extract_id(provided)
+        return extracted_id if extracted_id else re.sub(r"[^\w\-\.]", "_", provided)[:64]
+
+    def cached(self, video_id: str, video: bool = False) -> Optional[str]:
+        """Return the already downloaded file, if any. Audio can be any
+        format download produces, video only the merged mp4."""
+        filename_id = self._file_id(video_id or "")
+        for ext in ("mp4",) if video else ("mp3", "webm", "m4a", "mp4"):
+            path = Path("downloads") / f"{filename_id}.{ext}"
+            if path.exists():
+                return str(path)
+        return None
+
     async def download(self, video_id: str, video: bool = False) -> Optional[str]:
         downloads_dir = Path("downloads")
         downloads_dir.mkdir(parents=True, exist_ok=True)
         provided = video_id or ""
         extracted_id = self.extract_id(provided)
-        filename_id = extracted_id if extracted_id else re.sub(r"[^\w\-\.]", "_", provided)[:64]
+        filename_id = self._file_id(provided)
         ext = "mp4" if video else "mp3"
         filename = downloads_dir / f"{filename_id}.{ext}"
-        if filename.exists():
-            return str(filename)
+        if cached := self.cached(provided, video):
+            return cached
         api_base = getattr(config, "API_URL", None)
         if not api_base:
             logger.error("API_URL not found in config.")
@@ -202,6 +219,8 @@ class YouTube:
             else:
                 ydl_opts = {**base_opts, "format": "bestaudio[ext=webm][acodec=opus]"}
             def _download():
+                import yt_dlp
+
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     try:
                         url = provided if provided.startswith("http") else self.base + (extracted_id or provided)
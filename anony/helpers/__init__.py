@@ -4,7 +4,7 @@
 
 
 from ._admins import admin_check, can_manage_vc, is_admin, reload_admins
-from ._dataclass import Media, Track
+from ._dataclass import Media, Track, TrackInfo
 from ._exec import format_exception, meval
 from ._inline import Inline
 from ._queue import Queue
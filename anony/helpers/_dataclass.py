@@ -3,7 +3,10 @@
 # This file is part of AnonXMusic
 
 
+import sys
 from dataclasses import dataclass
+from typing import ClassVar
+from weakref import WeakValueDictionary
 
 
 @dataclass
@@ -21,19 +24,77 @@ class Media:
     playing: bool = False
 
 
-@dataclass
-class Track:
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class TrackInfo:
+    """
+    Immutable metadata of a YouTube track, shared by every queue holding it.
+    """
+
     id: str
     channel_name: str
     duration: str
     duration_sec: int
     title: str
     url: str
+    thumbnail: str = None
+    view_count: str = None
+
+    registry: ClassVar[WeakValueDictionary] = WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, **fields) -> "TrackInfo":
+        """Return the registered entry for the track id, creating it if needed."""
+        info = cls.registry.get(fields["id"])
+        if info is None:
+            if fields.get("channel_name"):
+                fields["channel_name"] = sys.intern(fields["channel_name"])
+            info = cls(**fields)
+            cls.registry[info.id] = info
+        return info
+
+
+@dataclass(slots=True)
+class Track:
+    """
+    A queued track: shared metadata plus the state of this queue entry.
+    """
+
+    info: TrackInfo
     file_path: str = None
     message_id: int = 0
     playing: bool = False
     time: int = 0
-    thumbnail: str = None
     user: str = None
-    view_count: str = None
     video: bool = False
+
+    @property
+    def id(self) -> str:
+        return self.info.id
+
+    @property
+    def channel_name(self) -> str:
+        return self.info.channel_name
+
+    @property
+    def duration(self) -> str:
+        return self.info.duration
+
+    @property
+    def duration_sec(self) -> int:
+        return self.info.duration_sec
+
+    @property
+    def title(self) -> str:
+        return self.info.title
+
+    @property
+    def url(self) -> str:
+        return self.info.url
+
+    @property
+    def thumbnail(self) -> str:
+        return self.info.thumbnail
+
+    @property
+    def view_count(self) -> str:
+        return self.info.view_count
@@ -7,7 +7,23 @@ import asyncio
 
 from pyrogram import enums, errors, types
 
-from anony import app, config, db, queue, yt
+from anony import admission, app, config, db, queue, yt
+
+
+def play_cost(m: types.Message, url: str | None, video: bool) -> int:
+    """Estimate the cost of a play request, in admission tokens."""
+    costs = admission.COSTS
+    fetch = costs["video"] if video else costs["download"]
+    if url:
+        if "playlist" in url:
+            return costs["playlist"]
+        if yt.cached(url, video):
+            return costs["cached"]
+        return fetch
+    if len(m.command) >= 2:
+        return costs["search"] + fetch
+    reply = m.reply_to_message
+    return costs["video"] if reply and (reply.video or reply.video_note) else costs["download"]
 
 
 def checkUB(play):
@@ -24,7 +40,7 @@ def checkUB(play):
         ):
             return await m.reply_text(m.lang["play_usage"])
 
-        if len(queue.get_queue(m.chat.id)) >= config.QUEUE_LIMIT:
+        if queue.size(m.chat.id) >= config.QUEUE_LIMIT:
             return await m.reply_text(m.lang["play_queue_full"].format(config.QUEUE_LIMIT))
 
         force = m.command[0].endswith("force") or (
@@ -45,6 +61,11 @@ def checkUB(play):
             ):
                 return await m.reply_text(m.lang["play_admin"])
 
+        if m.from_user.id not in app.sudoers:
+            wait = admission.admit(play_cost(m, url, video), m.from_user.id, m.chat.id)
+            if wait:
+                return await m.reply_text(m.lang["slow_down"].format(wait))
+
         if m.chat.id not in db.active_calls:
             client = await db.get_client(m.chat.id)
             try:
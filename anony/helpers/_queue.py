@@ -3,69 +3,258 @@
 # This file is part of AnonXMusic
 
 
-from collections import defaultdict, deque
-from typing import Union
+import sys
+from collections.abc import Sequence
+from itertools import islice
+from typing import Iterator, Union
+
+from anony.core.cache import sizeof
 
 from ._dataclass import Media, Track
 
 MediaItem = Union[Media, Track]
 
 
+class ChatQueue:
+    """
+    Queue of a single chat.
+
+    Items are kept in a list next to a parallel list of their ids, with a head
+    offset so popping the current item doesn't shift the list. A count of ids
+    gives O(1) membership checks, and positions are found with a C-level
+    `list.index` over the ids instead of comparing whole items.
+    """
+
+    __slots__ = ("_items", "_keys", "_ids", "_head")
+
+    def __init__(self):
+        self._items: list[MediaItem | None] = []
+        self._keys: list[str | None] = []
+        self._ids: dict[str, int] = {}
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+
+    def __bool__(self) -> bool:
+        return len(self._items) > self._head
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._ids
+
+    def __getitem__(self, pos: int) -> MediaItem:
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("queue index out of range")
+        return self._items[self._head + pos]
+
+    def __iter__(self) -> Iterator[MediaItem]:
+        return islice(self._items, self._head, None)
+
+    def _index(self, pos: int) -> int:
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("queue index out of range")
+        return self._head + pos
+
+    def _track(self, item_id: str) -> None:
+        self._ids[item_id] = self._ids.get(item_id, 0) + 1
+
+    def _untrack(self, item_id: str) -> None:
+        if self._ids[item_id] == 1:
+            del self._ids[item_id]
+        else:
+            self._ids[item_id] -= 1
+
+    def _compact(self) -> None:
+        if self._head > 32 and self._head * 2 > len(self._items):
+            del self._items[: self._head]
+            del self._keys[: self._head]
+            self._head = 0
+
+    def append(self, item: MediaItem) -> int:
+        self._items.append(item)
+        self._keys.append(item.id)
+        self._track(item.id)
+        return len(self) - 1
+
+    def appendleft(self, item: MediaItem) -> None:
+        if self._head:
+            self._head -= 1
+            self._items[self._head] = item
+            self._keys[self._head] = item.id
+        else:
+            self._items.insert(0, item)
+            self._keys.insert(0, item.id)
+        self._track(item.id)
+
+    def popleft(self) -> MediaItem:
+        if not self:
+            raise IndexError("pop from an empty queue")
+        item = self._items[self._head]
+        self._items[self._head] = self._keys[self._head] = None
+        self._head += 1
+        self._untrack(item.id)
+        self._compact()
+        return item
+
+    def insert(self, pos: int, item: MediaItem) -> None:
+        index = self._head + max(0, min(pos, len(self)))
+        self._items.insert(index, item)
+        self._keys.insert(index, item.id)
+        self._track(item.id)
+
+    def pop(self, pos: int) -> MediaItem:
+        if pos == 0:
+            return self.popleft()
+        index = self._index(pos)
+        item = self._items.pop(index)
+        del self._keys[index]
+        self._untrack(item.id)
+        return item
+
+    def move(self, src: int, dst: int) -> None:
+        index, target = self._index(src), self._index(dst)
+        self._items.insert(target, self._items.pop(index))
+        self._keys.insert(target, self._keys.pop(index))
+
+    def find(self, item_id: str) -> int:
+        """Return the position of the first item with the given id, or -1."""
+        if item_id not in self._ids:
+            return -1
+        return self._keys.index(item_id, self._head) - self._head
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._keys.clear()
+        self._ids.clear()
+        self._head = 0
+
+
+class QueueView(Sequence):
+    """
+    Read-only, copy-free view of a chat's queue.
+    """
+
+    __slots__ = ("_queue",)
+
+    def __init__(self, queue: ChatQueue):
+        self._queue = queue
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __getitem__(self, pos: int | slice) -> MediaItem | list[MediaItem]:
+        if isinstance(pos, slice):
+            return list(islice(self._queue, *pos.indices(len(self._queue))))
+        return self._queue[pos]
+
+    def __iter__(self) -> Iterator[MediaItem]:
+        return iter(self._queue)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._queue
+
+
 class Queue:
+    """
+    Queues of all chats. A chat only has an entry while its queue is non-empty,
+    so reads never create state and finished chats don't linger in memory.
+    """
+
     def __init__(self):
-        self.queues: dict[int, deque[MediaItem]] = defaultdict(deque)
+        self.queues: dict[int, ChatQueue] = {}
+        self.empty = ChatQueue()
+
+    def _get(self, chat_id: int) -> ChatQueue:
+        return self.queues.get(chat_id, self.empty)
+
+    def _drop_empty(self, chat_id: int) -> None:
+        if chat_id in self.queues and not self.queues[chat_id]:
+            del self.queues[chat_id]
 
     def add(self, chat_id: int, item: MediaItem) -> int:
         """Add an item to the queue and return its position (1-based)."""
-        self.queues[chat_id].append(item)
-        return len(self.queues[chat_id]) - 1
+        return self.queues.setdefault(chat_id, ChatQueue()).append(item)
 
     def check_item(self, chat_id: int, item_id: str) -> tuple[int, MediaItem | None]:
         """Check if an item with the given ID exists in the queue."""
-        pos, track = next(
-            (
-                (i, track)
-                for i, track in enumerate(list(self.queues[chat_id]))
-                if track.id == item_id
-            ),
-            (-1, None),
-        )
-        return pos, track
+        queue = self._get(chat_id)
+        pos = queue.find(item_id)
+        return pos, queue[pos] if pos != -1 else None
 
     def force_add(
         self, chat_id: int, item: MediaItem, remove: int | bool = False
     ) -> None:
         """Replace the currently playing item with a new one."""
-        self.remove_current(chat_id)
-        self.queues[chat_id].appendleft(item)
+        queue = self.queues.setdefault(chat_id, ChatQueue())
+        if queue:
+            queue.popleft()
+        queue.appendleft(item)
         if remove:
-            self.queues[chat_id].rotate(-remove)
-            self.queues[chat_id].popleft()
-            self.queues[chat_id].rotate(remove)
+            queue.pop(remove)
+
+    def insert(self, chat_id: int, pos: int, item: MediaItem) -> None:
+        """Insert an item at the given position (0 is the current item)."""
+        self.queues.setdefault(chat_id, ChatQueue()).insert(pos, item)
+
+    def move(self, chat_id: int, src: int, dst: int) -> None:
+        """Move the item at position `src` to position `dst`."""
+        self._get(chat_id).move(src, dst)
+
+    def remove(self, chat_id: int, pos: int) -> MediaItem:
+        """Remove and return the item at the given position."""
+        item = self._get(chat_id).pop(pos)
+        self._drop_empty(chat_id)
+        return item
 
     def get_current(self, chat_id: int) -> MediaItem | None:
         """Return the currently playing item (first in queue), if any."""
-        return self.queues[chat_id][0] if self.queues[chat_id] else None
+        queue = self._get(chat_id)
+        return queue[0] if queue else None
 
     def get_next(self, chat_id: int, check: bool = False) -> MediaItem | None:
         """Remove current item and return the next one, or None if empty."""
-        if not self.queues[chat_id]:
+        queue = self._get(chat_id)
+        if not queue:
             return None
         if check:
-            return self.queues[chat_id][1] if len(self.queues[chat_id]) > 1 else None
+            return queue[1] if len(queue) > 1 else None
+
+        queue.popleft()
+        if not queue:
+            self._drop_empty(chat_id)
+            return None
+        return queue[0]
 
-        self.queues[chat_id].popleft()
-        return self.queues[chat_id][0] if self.queues[chat_id] else None
+    def get_queue(self, chat_id: int) -> QueueView:
+        """Return a read-only view of the full queue including the current item."""
+        return QueueView(self._get(chat_id))
 
-    def get_queue(self, chat_id: int) -> list[MediaItem]:
-        """Return the full queue including the currently playing item."""
-        return list(self.queues[chat_id])
+    def size(self, chat_id: int) -> int:
+        """Return the number of items in the queue."""
+        return len(self._get(chat_id))
 
     def remove_current(self, chat_id: int) -> None:
         """Remove the currently playing item only (if exists)."""
-        if self.queues[chat_id]:
+        if self._get(chat_id):
             self.queues[chat_id].popleft()
+            self._drop_empty(chat_id)
 
     def clear(self, chat_id: int) -> None:
         """Clear the entire queue."""
-        self.queues[chat_id].clear()
+        self.queues.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "name": "queue",
+            "entries": len(self.queues),
+            "maxsize": 0,
+            "bytes": sys.getsizeof(self.queues)
+            + sum(
+                sizeof(q._items) + sizeof(q._keys) + sizeof(q._ids)
+                for q in self.queues.values()
+            ),
+        }
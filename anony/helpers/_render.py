@@ -0,0 +1,279 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+"""
+The thumbnail render pipeline, run in the thumbnail worker processes. It
+only depends on PIL, so it can be loaded on its own, without the bot.
+"""
+
+import os
+
+SIZE = (1280, 720)
+FILL = (255, 255, 255, 235)
+MARGIN_X = 80
+MARGIN_Y = 60
+
+PORTRAIT_SIZE = (520, 480)
+PORTRAIT_X = SIZE[0] // 2 - PORTRAIT_SIZE[0] // 2
+PORTRAIT_Y = MARGIN_Y
+GLOW_PADDING = 32
+GLOW_SIZE = (PORTRAIT_SIZE[0] + GLOW_PADDING * 2, PORTRAIT_SIZE[1] + GLOW_PADDING * 2)
+TEXT_TOP = PORTRAIT_Y + PORTRAIT_SIZE[1] + 40
+
+BAR_WIDTH = 12
+BAR_X = SIZE[0] - MARGIN_X
+BAR_TOP = PORTRAIT_Y + 10
+BAR_BOTTOM = max(TEXT_TOP - 20, PORTRAIT_Y + PORTRAIT_SIZE[1] - 10)
+BAR_PAD = 8
+BAR_BOX = (
+    BAR_X - BAR_WIDTH // 2 - BAR_PAD,
+    BAR_TOP - BAR_PAD,
+    BAR_X + BAR_WIDTH // 2 + BAR_PAD,
+    BAR_BOTTOM + BAR_PAD,
+)
+LABEL_X = BAR_X - BAR_WIDTH - 4
+
+FORMATS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+fonts = {}
+layers = {}
+
+# PIL is only used by the pool workers, which import it in init_worker.
+Image = ImageChops = ImageDraw = ImageEnhance = ImageFilter = ImageFont = None
+
+
+def init_worker() -> None:
+    """
+    Import PIL, load the fonts and build every layer that doesn't depend on
+    the track, once per worker process.
+    """
+    global Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+    from PIL import Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+
+    fonts["title"] = ImageFont.truetype("anony/helpers/NotoSans-Bold.ttf", 32)
+    fonts["info"] = ImageFont.truetype("anony/helpers/font2.ttf", 28)
+
+    vignette = Image.new("L", SIZE, 0)
+    ImageDraw.Draw(vignette).ellipse((-200, -100, SIZE[0] + 200, SIZE[1] + 300), fill=255)
+    layers["vignette"] = vignette.filter(ImageFilter.GaussianBlur(2))
+
+    mask = Image.new("L", PORTRAIT_SIZE, 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, *PORTRAIT_SIZE), radius=40, fill=255)
+    layers["portrait_mask"] = mask
+
+    shadow = Image.new("RGBA", (PORTRAIT_SIZE[0] + 40, PORTRAIT_SIZE[1] + 40), (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).rounded_rectangle(
+        (10, 10, PORTRAIT_SIZE[0] + 10, PORTRAIT_SIZE[1] + 10), radius=40, fill=(0, 0, 0, 180)
+    )
+    layers["shadow"] = shadow
+
+    # The glow used to be composited from a solid colour over a blurred mask
+    # and pasted through its own alpha; both steps only scale by the mask, so
+    # keep the resulting colour shade and alpha as two static masks.
+    glow_mask = Image.new("L", GLOW_SIZE, 0)
+    ImageDraw.Draw(glow_mask).rounded_rectangle(
+        (0, 0, *GLOW_SIZE), radius=40 + GLOW_PADDING // 2, fill=255
+    )
+    glow_mask = glow_mask.filter(ImageFilter.GaussianBlur(36)).filter(ImageFilter.GaussianBlur(22))
+    glow_alpha = glow_mask.point(lambda v: v * 80 // 255)
+    layers["glow_alpha"] = glow_alpha.point(lambda v: v * v // 255)
+    layers["glow_shade"] = ImageChops.multiply(glow_mask, glow_alpha)
+
+    bar_track = Image.new("RGBA", (BAR_BOX[2] - BAR_BOX[0], BAR_BOX[3] - BAR_BOX[1]), (0, 0, 0, 0))
+    ImageDraw.Draw(bar_track).rounded_rectangle(
+        (BAR_PAD, BAR_PAD, BAR_PAD + BAR_WIDTH, BAR_PAD + BAR_BOTTOM - BAR_TOP),
+        BAR_WIDTH,
+        fill=(255, 255, 255, 140),
+    )
+    layers["bar_track"] = bar_track.filter(ImageFilter.GaussianBlur(1))
+
+
+def truncate_text(draw, text, font, max_width):
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    words = text.split()
+    out = ""
+    for w in words:
+        candidate = (out + " " + w).strip() if out else w
+        if draw.textlength(candidate + ".", font=font) <= max_width:
+            out = candidate
+        else:
+            break
+    return out + "." if out else text[:10] + "."
+
+
+def get_dominant_colors(image, n=2):
+    """
+    Quantize a box-averaged copy of the image to a small palette and rank the
+    palette by pixel count, weighted towards saturated colors so flat black
+    or grey backgrounds don't win over the artwork itself.
+    """
+    small = image.resize((64, 64), Image.Resampling.BOX)
+    quant = small.quantize(colors=8, method=Image.Quantize.FASTOCTREE)
+    palette = quant.getpalette()
+    ranked = []
+    for count, index in quant.getcolors():
+        color = tuple(palette[index * 3 : index * 3 + 3])
+        chroma = (max(color) - min(color)) / 255
+        ranked.append((count * (0.3 + chroma), color))
+    ranked.sort(reverse=True)
+    return [color for _, color in ranked[:n]]
+
+
+def format_time(seconds: int) -> str:
+    minutes, seconds = divmod(max(int(seconds), 0), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def render(
+    cover_path: str,
+    output: str,
+    base: str,
+    title: str,
+    info: str,
+    duration: int,
+    dominant: tuple[int, int, int] | None = None,
+    fmt: str = "PNG",
+    quality: int = 85,
+) -> tuple[int, int, int]:
+    """
+    Render the thumbnail of a track from its cover image and return the
+    dominant color used. Runs in a worker process, so it must only depend
+    on its arguments and the static layers.
+
+    Everything but the progress bar fill and time labels is also saved to
+    `base`, so progress updates never have to run this pipeline again.
+    """
+    if not fonts:
+        init_worker()
+    font_title, font_info = fonts["title"], fonts["info"]
+
+    cover = Image.open(cover_path).convert("RGB")
+    if dominant is None:
+        dominant = get_dominant_colors(cover, n=1)[0]
+
+    # Blurring a 32px radius at full size costs far more than blurring the
+    # quarter-size frame with a quarter of the radius and scaling it back up.
+    # The result is not identical: the bilinear upscale is slightly softer,
+    # well under 1/255 on average (see bench/thumbnails.py).
+    small = cover.resize((SIZE[0] // 4, SIZE[1] // 4), Image.Resampling.BILINEAR)
+    bg = small.filter(ImageFilter.GaussianBlur(8)).resize(SIZE, Image.Resampling.BILINEAR)
+    # 0.42 brightness followed by a black overlay at alpha 10.
+    bg = ImageEnhance.Brightness(bg).enhance(0.42 * 245 / 255).convert("RGBA")
+    bg.putalpha(layers["vignette"])
+
+    shade = layers["glow_shade"]
+    glow = Image.merge(
+        "RGBA",
+        (
+            shade.point(lambda v: v * dominant[0] // 255),
+            shade.point(lambda v: v * dominant[1] // 255),
+            shade.point(lambda v: v * dominant[2] // 255),
+            layers["glow_alpha"],
+        ),
+    )
+    bg.alpha_composite(glow, (PORTRAIT_X - GLOW_PADDING, PORTRAIT_Y - GLOW_PADDING))
+
+    # Same crop as fitting the portrait out of the cover stretched to 1280x720,
+    # taken straight from the cover.
+    crop = cover.width * (SIZE[1] * PORTRAIT_SIZE[0] / PORTRAIT_SIZE[1]) / SIZE[0]
+    portrait = cover.resize(
+        PORTRAIT_SIZE,
+        Image.Resampling.LANCZOS,
+        box=((cover.width - crop) / 2, 0, (cover.width + crop) / 2, cover.height),
+    )
+    shadow = layers["shadow"]
+    bg.paste(shadow, (PORTRAIT_X, PORTRAIT_Y + 12), shadow)
+    bg.paste(portrait, (PORTRAIT_X, PORTRAIT_Y), layers["portrait_mask"])
+
+    draw = ImageDraw.Draw(bg)
+    center_x = SIZE[0] // 2
+    safe_width = SIZE[0] - MARGIN_X * 2
+
+    title_text = truncate_text(draw, title, font_title, safe_width - 36)
+    info_text = truncate_text(draw, info, font_info, safe_width - 36)
+
+    bbox = draw.textbbox((0, 0), title_text, font=font_title)
+    title_h = bbox[3] - bbox[1]
+
+    draw.text((center_x, TEXT_TOP), title_text, font=font_title, fill=(255, 255, 255, 255), anchor="ma")
+    draw.text((center_x, TEXT_TOP + title_h + 10), info_text, font=font_info, fill=(255, 248, 230, 255), anchor="ma")
+
+    bg.alpha_composite(layers["bar_track"], BAR_BOX[:2])
+    # The base is read back on every progress update, so favour speed.
+    save(bg, base, "PNG", quality, compress_level=1)
+
+    draw_progress(bg, dominant, 0, duration)
+    save(bg, output, fmt, quality)
+    return dominant
+
+
+def render_progress(
+    base: str,
+    output: str,
+    played: int,
+    duration: int,
+    dominant: tuple[int, int, int] | None = None,
+    fmt: str = "PNG",
+    quality: int = 85,
+) -> tuple[int, int, int]:
+    """
+    Draw the progress bar at `played` seconds onto a copy of a rendered base
+    and return the dominant color used.
+    """
+    if not fonts:
+        init_worker()
+
+    image = Image.open(base)
+    image.load()
+    if dominant is None:
+        dominant = get_dominant_colors(
+            image.crop((PORTRAIT_X, PORTRAIT_Y, PORTRAIT_X + PORTRAIT_SIZE[0], PORTRAIT_Y + PORTRAIT_SIZE[1])),
+            n=1,
+        )[0]
+
+    draw_progress(image, dominant, played, duration)
+    save(image, output, fmt, quality)
+    return dominant
+
+
+def draw_progress(
+    image: "Image.Image", dominant: tuple[int, int, int], played: int, duration: int
+) -> None:
+    """Draw the bar fill and time labels, touching only the bar region."""
+    fraction = min(max(played / duration, 0), 1) if duration else 0
+    progress_h = int((BAR_BOTTOM - BAR_TOP) * fraction)
+    if progress_h:
+        bar_fill = Image.new("RGBA", layers["bar_track"].size, (0, 0, 0, 0))
+        ImageDraw.Draw(bar_fill).rounded_rectangle(
+            (BAR_PAD, BAR_PAD + BAR_BOTTOM - BAR_TOP - progress_h, BAR_PAD + BAR_WIDTH, BAR_PAD + BAR_BOTTOM - BAR_TOP),
+            BAR_WIDTH,
+            fill=(*dominant, 255),
+        )
+        image.alpha_composite(bar_fill.filter(ImageFilter.GaussianBlur(2)), BAR_BOX[:2])
+
+    draw = ImageDraw.Draw(image)
+    draw.text((LABEL_X, BAR_TOP), format_time(duration), font=fonts["info"], fill=FILL, anchor="ra")
+    draw.text((LABEL_X, BAR_BOTTOM), format_time(played), font=fonts["info"], fill=FILL, anchor="rd")
+
+
+def save(image: "Image.Image", output: str, fmt: str, quality: int, **params) -> None:
+    """
+    Encode the image next to `output` and rename it into place, so readers
+    never see a partially written file.
+    """
+    temp = f"{output}.{os.getpid()}.tmp"
+    try:
+        if fmt == "PNG":
+            image.save(temp, "PNG", **params)
+        else:
+            image.convert("RGB").save(temp, fmt, quality=quality)
+        os.replace(temp, output)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
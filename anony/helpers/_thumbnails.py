@@ -1,23 +1,130 @@
+import asyncio
+import multiprocessing
 import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import aiohttp
-from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
-from collections import Counter
-from anony import config
+
+from anony import config, logger
+from anony.core.cache import LRUCache
 from anony.helpers import Track
+from anony.helpers._render import FORMATS, init_worker, render, render_progress
 
 
 class Thumbnail:
+    """
+    Fetches track covers asynchronously and renders thumbnails in a bounded
+    process pool, so the PIL work never blocks the event loop. Concurrent
+    requests for the same track share a single render.
+
+    Rendered thumbnails are kept under a byte budget, evicting the least
+    recently used ones first.
+    """
+
     def __init__(self):
-        self.size = (1280, 720)
-        self.font_title = ImageFont.truetype("anony/helpers/NotoSans-Bold.ttf", 32)
-        self.font_info = ImageFont.truetype("anony/helpers/font2.ttf", 28)
-        self.font_play = ImageFont.truetype("anony/helpers/NotoSans-Bold.ttf", 32)
-        
-        self.card_fill = (235, 235, 235, 220)
-        self.card_border = (220, 220, 220, 200)
-        self.fill = (255, 255, 255, 235)
-        self.margin_x = 80
-        self.margin_y = 60
+        self.pool: ProcessPoolExecutor | None = None
+        self.pending: dict[str, asyncio.Task] = {}
+        self.colors = LRUCache("thumb_colors", maxsize=2000)
+
+        self.format = config.THUMB_FORMAT if config.THUMB_FORMAT in FORMATS else "PNG"
+        self.ext = FORMATS[self.format]
+        self.limit = config.THUMB_CACHE_LIMIT * 1024**2
+        self.files: OrderedDict[str, int] | None = None
+        self.size = 0
+
+    def start(self) -> None:
+        """
+        Fork the render workers. Called first thing at startup, while the
+        process has no other threads: a thread holding a lock during the
+        fork would leave the child with a lock nobody releases.
+        """
+        if self.pool is not None:
+            return
+        if threading.active_count() > 1:
+            logger.warning("Forking thumbnail workers with other threads running.")
+        self.pool = ProcessPoolExecutor(
+            max_workers=config.THUMB_WORKERS,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+        )
+        # A fork pool starts all of its workers on the first submit.
+        self.pool.submit(os.getpid).result()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.start()
+        return self.pool
+
+    async def _submit(self, func, *args):
+        """
+        Run `func` in the pool. If a worker died (OOM, killed), the pool is
+        broken for good: replace it and retry once.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            if self.pool is pool:
+                logger.warning("Thumbnail worker died, restarting the pool.")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+
+    def close(self) -> None:
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _load_files(self) -> None:
+        """
+        Index the thumbnails left on disk, oldest first, and clear the temp
+        files of renders that never finished.
+        """
+        found = []
+        for f in os.scandir("cache"):
+            if not f.is_file():
+                continue
+            if f.name.startswith(("temp_", "progress_")) or (
+                f.name.endswith(".tmp") and (".png." in f.name or f".{self.ext}." in f.name)
+            ):
+                os.remove(f.path)
+            elif f.name.endswith((f".{self.ext}", "_base.png")):
+                found.append(f)
+        found.sort(key=lambda f: f.stat().st_mtime)
+        self.files = OrderedDict((f.path, f.stat().st_size) for f in found)
+        self.size = sum(self.files.values())
+
+    def _add_file(self, path: str) -> None:
+        size = os.path.getsize(path)
+        self.size += size - self.files.get(path, 0)
+        self.files[path] = size
+        self.files.move_to_end(path)
+
+        while self.size > self.limit and len(self.files) > 1:
+            old, old_size = self.files.popitem(last=False)
+            self.size -= old_size
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def _drop_file(self, path: str) -> None:
+        self.size -= self.files.pop(path, 0)
+
+    def stats(self) -> dict:
+        if self.files is None:
+            self._load_files()
+        return {
+            "name": "thumbnails",
+            "entries": len(self.files),
+            "maxsize": 0,
+            "bytes": self.size,
+        }
 
     async def save_thumb(self, output_path: str, url: str) -> str:
         async with aiohttp.ClientSession() as session:
@@ -27,123 +134,90 @@ class Thumbnail:
                     f.write(data)
         return output_path
 
-    def _truncate_text(self, draw, text, font, max_width):
-        if draw.textlength(text, font=font) <= max_width:
-            return text
-        words = text.split()
-        out = ""
-        for w in words:
-            candidate = (out + " " + w).strip() if out else w
-            if draw.textlength(candidate + ".", font=font) <= max_width:
-                out = candidate
-            else:
-                break
-        return out + "." if out else text[:10] + "."
-
-    def _get_dominant_colors(self, image, n=2):
-        img = image.resize((100, 100)).convert("RGB")
-        return [c[0] for c in Counter(img.getdata()).most_common(n)]
+    def _cached(self, path: str) -> bool:
+        if self.files is None:
+            self._load_files()
+        if path in self.files:
+            if os.path.exists(path):
+                self.files.move_to_end(path)
+                return True
+            self._drop_file(path)
+        return False
 
     async def generate(self, song: Track) -> str:
+        output = f"cache/{song.id}.{self.ext}"
+        if self._cached(output):
+            return output
+        return await self._render(song)
+
+    def prerender(self, song: Track) -> None:
+        """Start rendering the track's thumbnail in the background."""
+        if not self._cached(f"cache/{song.id}.{self.ext}"):
+            self._task(song)
+
+    async def progress(self, song: Track, played: int, output: str) -> str | None:
+        """
+        Render the thumbnail with the progress bar at `played` seconds to
+        `output`, reusing the track's cached base.
+        """
+        base = f"cache/{song.id}_base.png"
+        if not self._cached(base):
+            if await self._render(song) == config.DEFAULT_THUMB:
+                return None
         try:
-            temp = f"cache/temp_{song.id}.jpg"
-            output = f"cache/{song.id}.png"
-            if os.path.exists(output):
-                return output
-
-            await self.save_thumb(temp, song.thumbnail)
-            cover = Image.open(temp).convert("RGBA").resize(self.size, Image.Resampling.LANCZOS)
-
-            bg = cover.filter(ImageFilter.GaussianBlur(32))
-            bg = ImageEnhance.Brightness(bg).enhance(0.42)
-            bg = Image.alpha_composite(bg, Image.new("RGBA", self.size, (0, 0, 0, 10)))
-
-            vignette = Image.new("L", self.size, 0)
-            draw_v = ImageDraw.Draw(vignette)
-            draw_v.ellipse((-200, -100, self.size[0] + 200, self.size[1] + 300), fill=255)
-            vignette = vignette.filter(ImageFilter.GaussianBlur(2))
-            bg.putalpha(vignette)
-
-            portrait_size = (520, 480)
-            portrait = ImageOps.fit(cover, portrait_size, Image.Resampling.LANCZOS, centering=(0.5, 0.5))
-            mask = Image.new("L", portrait_size, 0)
-            ImageDraw.Draw(mask).rounded_rectangle((0, 0, *portrait_size), radius=40, fill=255)
-            portrait.putalpha(mask)
-
-            shadow = Image.new("RGBA", (portrait_size[0] + 40, portrait_size[1] + 40), (0, 0, 0, 0))
-            ImageDraw.Draw(shadow).rounded_rectangle(
-                (10, 10, portrait_size[0] + 10, portrait_size[1] + 10), radius=40, fill=(0, 0, 0, 180)
+            self.colors[song.id] = await self._submit(
+                render_progress,
+                base,
+                output,
+                played,
+                song.duration_sec,
+                self.colors.get(song.id),
+                self.format,
+                config.THUMB_QUALITY,
             )
-
-            center_x = self.size[0] // 2
-            portrait_x = center_x - portrait_size[0] // 2
-            portrait_y = self.margin_y
-
-            glow_padding = 32
-            glow_size = (portrait_size[0] + glow_padding * 2, portrait_size[1] + glow_padding * 2)
-            glow_mask = Image.new("L", glow_size, 0)
-            ImageDraw.Draw(glow_mask).rounded_rectangle(
-                (0, 0, *glow_size), radius=40 + glow_padding // 2, fill=255
-            )
-            glow_mask = glow_mask.filter(ImageFilter.GaussianBlur(36))
-
-            dominant = self._get_dominant_colors(cover, n=1)[0] if cover else (255, 255, 255)
-            colored_glow = Image.composite(
-                Image.new("RGBA", glow_size, (*dominant, 80)),
-                Image.new("RGBA", glow_size, (0, 0, 0, 0)),
-                glow_mask.filter(ImageFilter.GaussianBlur(22))
-            )
-
-            glow_layer = Image.new("RGBA", self.size, (0, 0, 0, 0))
-            glow_layer.paste(colored_glow, (portrait_x - glow_padding, portrait_y - glow_padding), colored_glow)
-            bg = Image.alpha_composite(bg, glow_layer)
-
-            bg.paste(shadow, (portrait_x, portrait_y + 12), shadow)
-            bg.paste(portrait, (portrait_x, portrait_y), portrait)
-
-            draw = ImageDraw.Draw(bg)
-            text_top = portrait_y + portrait_size[1] + 40
-            safe_width = self.size[0] - self.margin_x * 2
-
-            title_text = self._truncate_text(draw, song.title, self.font_title, safe_width - 36)
-            info_text = f"{song.channel_name[:40]} • {song.view_count} views"
-            info_text = self._truncate_text(draw, info_text, self.font_info, safe_width - 36)
-
-            title_h = draw.textbbox((0, 0), title_text, font=self.font_title)[3] - draw.textbbox((0, 0), title_text, font=self.font_title)[1]
-
-            draw.text((center_x, text_top), title_text, font=self.font_title, fill=(255, 255, 255, 255), anchor="ma")
-            draw.text((center_x, text_top + title_h + 10), info_text, font=self.font_info, fill=(255, 248, 230, 255), anchor="ma")
-
-            bar_width = 12
-            bar_x = self.size[0] - self.margin_x
-            bar_top = portrait_y + 10
-            bar_bottom = max(text_top - 20, portrait_y + portrait_size[1] - 10)
-
-            track_left = bar_x - bar_width // 2
-            track_right = bar_x + bar_width // 2
-
-            track_layer = Image.new("RGBA", self.size, (0, 0, 0, 0))
-            tdraw = ImageDraw.Draw(track_layer)
-            tdraw.rounded_rectangle((track_left, bar_top, track_right, bar_bottom), bar_width, fill=(255, 255, 255, 140))
-            bg = Image.alpha_composite(bg, track_layer.filter(ImageFilter.GaussianBlur(1)))
-
-            fill_fraction = 0.6
-            progress_h = int((bar_bottom - bar_top) * fill_fraction)
-            fill_top_y = bar_bottom - progress_h
-
-            fill_layer = Image.new("RGBA", self.size, (0, 0, 0, 0))
-            ImageDraw.Draw(fill_layer).rounded_rectangle(
-                (track_left, fill_top_y, track_right, bar_bottom), bar_width, fill=(*dominant, 255)
+            return output
+        except Exception as e:
+            logger.warning(f"Progress thumbnail failed: {e}")
+            return None
+
+    def _task(self, song: Track) -> asyncio.Task:
+        # The pending task doubles as the per-track render lock.
+        task = self.pending.get(song.id)
+        if task is None:
+            task = asyncio.create_task(self._generate(song))
+            self.pending[song.id] = task
+            task.add_done_callback(lambda _: self.pending.pop(song.id, None))
+        return task
+
+    async def _render(self, song: Track) -> str:
+        return await asyncio.shield(self._task(song))
+
+    async def _generate(self, song: Track) -> str:
+        output = f"cache/{song.id}.{self.ext}"
+        base = f"cache/{song.id}_base.png"
+        temp = f"cache/temp_{song.id}_{uuid.uuid4().hex[:8]}.jpg"
+        try:
+            await self.save_thumb(temp, song.thumbnail)
+            info = f"{song.channel_name[:40]} • {song.view_count} views"
+            self.colors[song.id] = await self._submit(
+                render,
+                temp,
+                output,
+                base,
+                song.title,
+                info,
+                song.duration_sec,
+                self.colors.get(song.id),
+                self.format,
+                config.THUMB_QUALITY,
             )
-            bg = Image.alpha_composite(bg, fill_layer.filter(ImageFilter.GaussianBlur(2)))
-
-            draw.text((bar_x - 12, bar_top - 40), "0:00", font=self.font_info, fill=self.fill, anchor="rs")
-            draw.text((bar_x - 12, bar_bottom + 10), "0:30", font=self.font_info, fill=self.fill, anchor="rs")
-
-            bg.save(output, "PNG")
-            os.remove(temp)
+            self._add_file(base)
+            self._add_file(output)
             return output
 
         except Exception as e:
-            print(f"Thumbnail generation failed: {e}")
+            logger.warning(f"Thumbnail generation failed: {e}")
             return config.DEFAULT_THUMB
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
@@ -4,10 +4,12 @@
 
 
 import re
+from typing import Awaitable, Callable
 
 from pyrogram import enums, types
+from pyrogram.errors import FileReferenceExpired, FileReferenceInvalid, MediaEmpty
 
-from anony import app
+from anony import app, config, db
 
 
 class Utilities:
@@ -37,6 +39,34 @@ class Utilities:
         parts = [int(p) for p in time.strip().split(":")]
         return sum(value * 60**i for i, value in enumerate(reversed(parts)))
 
+    async def send_photo(
+        self,
+        key: str,
+        photo: str | Callable[[], Awaitable[str]],
+        send: Callable[[str], Awaitable[types.Message]],
+    ) -> types.Message:
+        """
+        Send a photo through `send`, passing the Telegram file_id saved for
+        `key` instead of uploading it again. `photo` may be a coroutine
+        function, so the file is only produced when it has to be uploaded.
+        """
+        file_id = await db.get_file_id(key)
+        if file_id:
+            try:
+                return await send(file_id)
+            except (FileReferenceExpired, FileReferenceInvalid, MediaEmpty, ValueError):
+                await db.rm_file_id(key)
+
+        if callable(photo):
+            photo = await photo()
+            # Fallbacks share the default image, which has a key of its own.
+            if photo == config.DEFAULT_THUMB:
+                key = photo
+        sent = await send(photo)
+        if isinstance(sent, types.Message) and sent.photo:
+            await db.set_file_id(key, sent.photo.file_id)
+        return sent
+
     async def extract_user(self, msg: types.Message) -> types.User | None:
         if msg.reply_to_message:
             return msg.reply_to_message.from_user
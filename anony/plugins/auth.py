@@ -5,7 +5,7 @@
 
 import time
 
-from pyrogram import filters, types
+from pyrogram import enums, filters, types
 
 from anony import app, db, lang
 from anony.helpers import admin_check, is_admin, utils
@@ -43,3 +43,15 @@ async def _admincache(_, m: types.Message):
     sent = await m.reply_text(m.lang["admin_cache_reloading"])
     await db.get_admins(m.chat.id, reload=True)
     await sent.edit_text(m.lang["admin_cache_reloaded"])
+
+
+@app.on_chat_member_updated(filters.group, group=8)
+async def _admin_updated(_, update: types.ChatMemberUpdated):
+    member = update.new_chat_member or update.old_chat_member
+    if not member or not member.user or member.user.is_bot:
+        return
+    admin = bool(update.new_chat_member) and update.new_chat_member.status in (
+        enums.ChatMemberStatus.ADMINISTRATOR,
+        enums.ChatMemberStatus.OWNER,
+    )
+    db.update_admin(update.chat.id, member.user.id, admin)
@@ -6,91 +6,108 @@
 import os
 import asyncio
 
-from pyrogram import errors, filters, types
+from pyrogram import filters, types
 
-from anony import app, db, lang
+from anony import app, broadcaster, lang, logger
+from anony.helpers import utils
 
 
-broadcasting = False
-
 @app.on_message(filters.command(["broadcast"]) & app.sudoers)
 @lang.language()
 async def _broadcast(_, message: types.Message):
-    global broadcasting
-    if not message.reply_to_message:
-        return await message.reply_text(message.lang["gcast_usage"])
-
-    if broadcasting:
+    # Claimed before the first await, so a second /broadcast can't slip in
+    # while this one is being prepared.
+    if not broadcaster.claim():
         return await message.reply_text(message.lang["gcast_active"])
+    try:
+        await broadcast(message)
+    finally:
+        broadcaster.release()
 
-    msg = message.reply_to_message
-    count, ucount = 0, 0
-    chats, groups, users = [], [], []
-    sent = await message.reply_text(message.lang["gcast_start"])
-
-    if "-nochat" not in message.command:
-        groups.extend(await db.get_chats())
-    if "-user" in message.command:
-        users.extend(await db.get_users())
 
-    chats.extend(groups + users)
-    broadcasting = True
-
-    await msg.forward(app.logger)
-    await (await app.send_message(
-        chat_id=app.logger, 
-        text=message.lang["gcast_log"].format(
-            message.from_user.id,
-            message.from_user.mention,
-            message.text,
+async def broadcast(message: types.Message):
+    if "-resume" in message.command:
+        job = await broadcaster.last()
+        if not job:
+            return await message.reply_text(message.lang["gcast_no_resume"])
+        try:
+            task = await broadcaster.resume(job)
+        except ValueError:
+            return await message.reply_text(message.lang["gcast_no_resume"])
+        sent = await message.reply_text(message.lang["gcast_resumed"])
+    else:
+        if not message.reply_to_message:
+            return await message.reply_text(message.lang["gcast_usage"])
+
+        msg = message.reply_to_message
+        sent = await message.reply_text(message.lang["gcast_start"])
+        await msg.forward(app.logger)
+        await (await app.send_message(
+            chat_id=app.logger,
+            text=message.lang["gcast_log"].format(
+                message.from_user.id,
+                message.from_user.mention,
+                message.text,
+            )
+        )).pin(disable_notification=False)
+        await asyncio.sleep(5)
+
+        task = await broadcaster.start(
+            msg,
+            chats="-nochat" not in message.command,
+            users="-user" in message.command,
+            copy="-copy" in message.text,
+            by=message.from_user.id,
         )
-    )).pin(disable_notification=False)
-    await asyncio.sleep(5)
 
-    failed = ""
-    for chat in chats:
-        if not broadcasting:
-            await sent.edit_text(message.lang["gcast_stopped"].format(count, ucount))
+    while not task.done():
+        await asyncio.wait({task}, timeout=15)
+        if task.done():
             break
-
+        stats = broadcaster.stats()
         try:
-            (
-                await msg.copy(chat, reply_markup=msg.reply_markup)
-                if "-copy" in message.text
-                else await msg.forward(chat)
-            )
-            if chat in groups:
-                count += 1
-            else:
-                ucount += 1
-            await asyncio.sleep(0.1)
-        except errors.FloodWait as fw:
-            await asyncio.sleep(fw.value + 30)
-        except Exception as ex:
-            failed += f"{chat} - {ex}\n"
-            continue
-
-    text = message.lang["gcast_end"].format(count, ucount)
+            await sent.edit_text(message.lang["gcast_progress"].format(
+                stats["done"],
+                stats["total"],
+                stats["sent_chats"],
+                stats["sent_users"],
+                stats["failed"],
+                stats["rate"],
+                utils.format_eta(stats["eta"]),
+            ))
+        except Exception:
+            pass
+
+    try:
+        job = task.result()
+    except Exception as ex:
+        logger.warning(f"Broadcast failed: {type(ex).__name__}: {ex}", exc_info=True)
+        return await sent.edit_text(message.lang["gcast_stopped"].format(
+            broadcaster.job["sent_chats"], broadcaster.job["sent_users"]
+        ))
+
+    key = "gcast_end" if job["status"] == "done" else "gcast_stopped"
+    text = message.lang[key].format(job["sent_chats"], job["sent_users"])
+    failed = await broadcaster.failures(job)
+    await broadcaster.prune(job)
     if failed:
         with open("errors.txt", "w") as f:
-            f.write(failed)
+            f.write("\n".join(failed))
         await message.reply_document(
             document="errors.txt",
             caption=text,
         )
         os.remove("errors.txt")
-    broadcasting = False
     await sent.edit_text(text)
 
 
 @app.on_message(filters.command(["stop_gcast", "stop_broadcast"]) & app.sudoers)
 @lang.language()
 async def _stop_gcast(_, message: types.Message):
-    global broadcasting
-    if not broadcasting:
+    if not broadcaster.active:
         return await message.reply_text(message.lang["gcast_inactive"])
 
-    broadcasting = False
+    broadcaster.stop()
     await (await app.send_message(
         chat_id=app.logger,
         text=message.lang["gcast_stop_log"].format(
@@ -7,7 +7,7 @@ import re
 
 from pyrogram import filters, types
 
-from anony import anon, app, db, lang, queue, tg, yt
+from anony import anon, app, db, executor, lang, prefetch, queue, tg
 from anony.helpers import admin_check, buttons, can_manage_vc
 
 
@@ -18,6 +18,29 @@ async def cancel_dl(_, query: types.CallbackQuery):
     await tg.cancel(query)
 
 
+async def force_play(query: types.CallbackQuery, chat_id: int, item_id: str) -> None:
+    """Play a queued item right away, in place of the current one."""
+    pos, media = queue.check_item(chat_id, item_id)
+    if not media or pos == -1:
+        return await query.edit_message_text(query.lang["play_expired"])
+
+    m_id = queue.get_current(chat_id).message_id
+    queue.force_add(chat_id, media, remove=pos)
+    prefetch.schedule(chat_id)
+    try:
+        await app.delete_messages(
+            chat_id=chat_id, message_ids=[m_id, media.message_id], revoke=True
+        )
+        media.message_id = None
+    except:
+        pass
+
+    msg = await app.send_message(chat_id=chat_id, text=query.lang["play_next"])
+    await prefetch.fetch(media)
+    media.message_id = msg.id
+    await anon.play_media(chat_id, msg, media)
+
+
 @app.on_callback_query(filters.regex("controls") & ~app.bl_users)
 @lang.language()
 @can_manage_vc
@@ -39,7 +62,7 @@ async def _controls(_, query: types.CallbackQuery):
             return await query.answer(
                 query.lang["play_already_paused"], show_alert=True
             )
-        await anon.pause(chat_id)
+        await executor.submit(chat_id, anon.pause, chat_id)
         if qaction:
             return await query.edit_message_reply_markup(
                 reply_markup=buttons.queue_markup(chat_id, query.lang["paused"], False)
@@ -50,7 +73,7 @@ async def _controls(_, query: types.CallbackQuery):
     elif action == "resume":
         if await db.playing(chat_id):
             return await query.answer(query.lang["play_not_paused"], show_alert=True)
-        await anon.resume(chat_id)
+        await executor.submit(chat_id, anon.resume, chat_id)
         if qaction:
             return await query.edit_message_reply_markup(
                 reply_markup=buttons.queue_markup(chat_id, query.lang["playing"], True)
@@ -58,40 +81,22 @@ async def _controls(_, query: types.CallbackQuery):
         reply = query.lang["play_resumed"].format(user)
 
     elif action == "skip":
-        await anon.play_next(chat_id)
+        await executor.submit(chat_id, anon.play_next, chat_id, key="skip", count=True)
         status = query.lang["skipped"]
         reply = query.lang["play_skipped"].format(user)
 
     elif action == "force":
-        pos, media = queue.check_item(chat_id, args[3])
-        if not media or pos == -1:
-            return await query.edit_message_text(query.lang["play_expired"])
-
-        m_id = queue.get_current(chat_id).message_id
-        queue.force_add(chat_id, media, remove=pos)
-        try:
-            await app.delete_messages(
-                chat_id=chat_id, message_ids=[m_id, media.message_id], revoke=True
-            )
-            media.message_id = None
-        except:
-            pass
-
-        msg = await app.send_message(chat_id=chat_id, text=query.lang["play_next"])
-        if not media.file_path:
-            media.file_path = await yt.download(media.id, video=media.video)
-        media.message_id = msg.id
-        return await anon.play_media(chat_id, msg, media)
+        return await executor.submit(chat_id, force_play, query, chat_id, args[3])
 
     elif action == "replay":
         media = queue.get_current(chat_id)
         media.user = user
-        await anon.replay(chat_id)
+        await executor.submit(chat_id, anon.replay, chat_id)
         status = query.lang["replayed"]
         reply = query.lang["play_replayed"].format(user)
 
     elif action == "stop":
-        await anon.stop(chat_id)
+        await executor.submit(chat_id, anon.stop, chat_id, key="stop")
         status = query.lang["stopped"]
         reply = query.lang["play_stopped"].format(user)
 
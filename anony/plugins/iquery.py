@@ -2,13 +2,17 @@
 # Licensed under the MIT License.
 # This file is part of AnonXMusic
 
+import asyncio
 
 from py_yt import VideosSearch
 from pyrogram import types
 
-from anony import app
+from anony import admission, app, lang
 from anony.helpers import buttons
 
+# Pending search of each user, replaced by every new keystroke.
+pending: dict[int, asyncio.Task] = {}
+
 
 @app.on_inline_query(~app.bl_users)
 async def inline_query_handler(_, query: types.InlineQuery):
@@ -16,6 +20,40 @@ async def inline_query_handler(_, query: types.InlineQuery):
     if not text:
         return
 
+    # Debounce outside of the handler, so typing doesn't hold a worker.
+    user_id = query.from_user.id
+    if task := pending.get(user_id):
+        task.cancel()
+    task = pending[user_id] = asyncio.create_task(answer(query, text))
+    task.add_done_callback(
+        lambda t: pending.pop(user_id) if pending.get(user_id) is t else None
+    )
+
+
+async def answer(query: types.InlineQuery, text: str) -> None:
+    """Search once the user stops typing for a moment."""
+    await asyncio.sleep(0.6)
+    user_id = query.from_user.id
+    wait = 0
+    if user_id not in app.sudoers:
+        wait = admission.admit_inline(user_id)
+    if wait:
+        code = (query.from_user.language_code or "en")[:2]
+        _lang = lang.languages.get(code, lang.languages["en"])
+        return await app.answer_inline_query(
+            query.id,
+            results=[
+                types.InlineQueryResultArticle(
+                    title=_lang["slow_down"].format(wait),
+                    input_message_content=types.InputTextMessageContent(
+                        _lang["slow_down"].format(wait)
+                    ),
+                )
+            ],
+            cache_time=1,
+            is_personal=True,
+        )
+
     try:
         search = VideosSearch(text, limit=15)
         results = (await search.next()).get("result", [])
@@ -53,5 +91,5 @@ async def inline_query_handler(_, query: types.InlineQuery):
 
         if answers:
             await app.answer_inline_query(query.id, results=answers, cache_time=5)
-    except:
+    except Exception:
         pass
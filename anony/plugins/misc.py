@@ -4,117 +4,196 @@
 
 
 import asyncio
+import os
 import time
 
-from pyrogram import enums, filters, types
+from pyrogram import enums, errors, filters, types
 
-from anony import anon, app, config, db, lang, queue, tasks, userbot, yt
-from anony.helpers import buttons
+from anony import (anon, app, config, db, executor, lang, logger,
+                   queue, scheduler, startup, userbot)
+from anony.helpers import Track, buttons, thumb
 
 
 @app.on_message(filters.video_chat_started, group=19)
 @app.on_message(filters.video_chat_ended, group=20)
 async def _watcher_vc(_, m: types.Message):
-    await anon.stop(m.chat.id)
-
-
-async def auto_leave():
-    while True:
-        await asyncio.sleep(1800)
-        for ub in userbot.clients:
-            left = 0
-            try:
-                for dialog in await ub.get_dialogs():
-                    chat_id = dialog.chat.id
-                    if left >= 20:
-                        break
-                    if chat_id in [app.logger, -1001686672798, -1001549206010]:
-                        continue
-                    if dialog.chat.type in [
-                        enums.ChatType.GROUP,
-                        enums.ChatType.SUPERGROUP,
-                    ]:
-                        if chat_id in db.active_calls:
-                            continue
-                        await ub.leave_chat(chat_id)
-                        left += 1
-                    await asyncio.sleep(5)
-            except:
-                continue
-
-
-async def track_time():
-    while True:
-        await asyncio.sleep(1)
-        for chat_id in db.active_calls:
-            if not await db.playing(chat_id):
-                continue
-            media = queue.get_current(chat_id)
-            if not media.playing:
-                continue
-            media.time += 1
-
-
-async def update_timer(length=10):
-    while True:
-        await asyncio.sleep(7)
-        for chat_id in db.active_calls:
-            if not await db.playing(chat_id):
+    await executor.submit(m.chat.id, anon.stop, m.chat.id, key="stop")
+
+
+async def backfill_joined(num: int, ub) -> None:
+    """
+    Add the groups the assistant was already in to the joined index, once
+    per assistant, so chats it joined before the index existed are left too.
+    """
+    chat_ids = []
+    try:
+        async for dialog in ub.get_dialogs():
+            if dialog.chat.type in [enums.ChatType.GROUP, enums.ChatType.SUPERGROUP]:
+                chat_ids.append(dialog.chat.id)
+    except Exception as ex:
+        logger.warning(f"Assistant {num} dialogs unavailable: {type(ex).__name__}: {ex}")
+        return
+    if added := await db.add_joined(num, chat_ids):
+        logger.info(f"Assistant {num}: indexed {added} chat(s) from its dialogs.")
+
+
+async def auto_leave(limit=20, idle=7200):
+    for num, ub in enumerate(userbot.clients, start=1):
+        if num not in db.backfilled:
+            await backfill_joined(num, ub)
+        for chat_id in db.get_idle_chats(num, idle, limit):
+            if chat_id in [app.logger, -1001686672798, -1001549206010]:
                 continue
             try:
-                media = queue.get_current(chat_id)
-                duration, message_id = media.duration_sec, media.message_id
-                if not duration or not message_id or not media.playing:
-                    continue
-                played = media.time
-                remaining = duration - played
-                pos = min(int((played / duration) * length), length - 1)
-                timer = "—" * pos + "◉" + "—" * (length - pos - 1)
-
-                if remaining <= 30:
-                    next = queue.get_next(chat_id, check=True)
-                    if next and not next.file_path:
-                        next.file_path = await yt.download(next.id, video=next.video)
-
-                if remaining < 10:
-                    remove = True
-                else:
-                    remove = False
-                    timer = f"{time.strftime('%M:%S', time.gmtime(played))} | {timer} | -{time.strftime('%M:%S', time.gmtime(remaining))}"
-
-                await app.edit_message_reply_markup(
-                    chat_id=chat_id,
-                    message_id=message_id,
-                    reply_markup=buttons.controls(
-                        chat_id=chat_id, timer=timer, remove=remove
-                    ),
-                )
-            except:
+                await ub.leave_chat(chat_id)
+            except (errors.UserNotParticipant, errors.ChannelPrivate, errors.PeerIdInvalid):
+                # Not in the chat anymore, nothing to leave.
                 pass
-
-
-async def vc_watcher(sleep=15):
-    while True:
-        await asyncio.sleep(sleep)
-        for chat_id in db.active_calls:
-            client = await db.get_assistant(chat_id)
-            played = await client.time(chat_id)
-            participants = await client.get_participants(chat_id)
-            if len(participants) < 2 and played > 30:
-                _lang = await lang.get_lang(chat_id)
-                sent = await app.edit_message_reply_markup(
-                    chat_id=chat_id,
-                    message_id=queue.get_current(chat_id).message_id,
-                    reply_markup=buttons.controls(
-                        chat_id=chat_id, status=_lang["stopped"], remove=True
-                    ),
-                )
-                await anon.stop(chat_id)
-                await sent.reply_text(_lang["auto_left"])
+            except Exception as ex:
+                logger.warning(f"Assistant {num} failed to leave {chat_id}: {type(ex).__name__}")
+                continue
+            await db.rm_joined(chat_id)
+            await asyncio.sleep(5)
+
+
+# chat_id: (media, monotonic start, played at start, played last written)
+clocks: dict[int, tuple[Track, float, int, int]] = {}
+
+
+async def track_time(chat_id: int):
+    """
+    Keep the played time of the current track from the clock rather than
+    counting ticks, so late or skipped ticks don't make it drift.
+    """
+    media = queue.get_current(chat_id)
+    if not await db.playing(chat_id) or not media or not media.playing:
+        clocks.pop(chat_id, None)
+        return
+
+    now = time.monotonic()
+    clock = clocks.get(chat_id)
+    if clock is None or clock[0] is not media or clock[3] != media.time:
+        # A new track, or resumed or seeked since: count from here.
+        clock = (media, now, media.time, media.time)
+    played = clock[2] + int(now - clock[1])
+    media.time = played
+    clocks[chat_id] = (media, clock[1], clock[2], played)
+
+    if len(clocks) > len(db.active_calls):
+        for chat_id in [c for c in clocks if c not in db.active_calls]:
+            del clocks[chat_id]
+
+
+def timer_markup(chat_id: int, media: Track, length=10) -> types.InlineKeyboardMarkup:
+    played, duration = media.time, media.duration_sec
+    remaining = duration - played
+    pos = min(int((played / duration) * length), length - 1)
+    timer = "—" * pos + "◉" + "—" * (length - pos - 1)
+
+    if remaining < 10:
+        remove = True
+    else:
+        remove = False
+        timer = f"{time.strftime('%M:%S', time.gmtime(played))} | {timer} | -{time.strftime('%M:%S', time.gmtime(remaining))}"
+    return buttons.controls(chat_id=chat_id, timer=timer, remove=remove)
+
+
+async def update_timer(chat_id: int, length=10):
+    if not await db.playing(chat_id):
+        return
+    try:
+        media = queue.get_current(chat_id)
+        duration, message_id = media.duration_sec, media.message_id
+        if not duration or not message_id or not media.playing:
+            return
+
+        await app.edit_message_reply_markup(
+            chat_id=chat_id,
+            message_id=message_id,
+            reply_markup=timer_markup(chat_id, media, length),
+        )
+    except:
+        pass
+
+
+async def update_thumb(chat_id: int):
+    if not await db.playing(chat_id):
+        return
+    media = queue.get_current(chat_id)
+    if not isinstance(media, Track) or not media.duration_sec or not media.message_id:
+        return
+
+    output = f"cache/progress_{chat_id}.{thumb.ext}"
+    if not await thumb.progress(media, media.time, output):
+        return
+    try:
+        _lang = await lang.get_lang(chat_id)
+        await app.edit_message_media(
+            chat_id=chat_id,
+            message_id=media.message_id,
+            media=types.InputMediaPhoto(
+                media=output,
+                caption=_lang["play_media"].format(
+                    media.url, media.title, media.duration, media.user
+                ),
+            ),
+            reply_markup=timer_markup(chat_id, media),
+        )
+    finally:
+        os.remove(output)
+
+
+async def vc_watcher(chat_id: int):
+    client = await db.get_assistant(chat_id)
+    played = await client.time(chat_id)
+    participants = await client.get_participants(chat_id)
+    if len(participants) < 2 and played > 30:
+        _lang = await lang.get_lang(chat_id)
+        sent = await app.edit_message_reply_markup(
+            chat_id=chat_id,
+            message_id=queue.get_current(chat_id).message_id,
+            reply_markup=buttons.controls(
+                chat_id=chat_id, status=_lang["stopped"], remove=True
+            ),
+        )
+        await executor.submit(chat_id, anon.stop, chat_id, key="stop")
+        await sent.reply_text(_lang["auto_left"])
+
+
+@app.on_message(filters.command(["jobs"]) & app.sudoers)
+@lang.language()
+async def _jobs(_, m: types.Message):
+    text = m.lang["jobs_report"]
+    for job in scheduler.stats():
+        text += m.lang["jobs_item"].format(
+            job["name"],
+            job["interval"],
+            job["runs"],
+            job["skipped"],
+            job["missed"],
+            job["errors"],
+            job["avg_time"] * 1000,
+            job["max_time"] * 1000,
+            job["last_lag"] * 1000,
+            job["max_lag"] * 1000,
+        )
+    await m.reply_text(text)
+
+
+@app.on_message(filters.command(["boot"]) & app.sudoers)
+@lang.language()
+async def _boot(_, m: types.Message):
+    text = m.lang["boot_report"].format(startup.ready)
+    for stage in startup.stats():
+        text += m.lang["boot_item"].format(stage["name"], stage["offset"], stage["time"])
+    await m.reply_text(text)
 
 
 if config.AUTO_LEAVE:
-    tasks.append(asyncio.create_task(auto_leave()))
-tasks.append(asyncio.create_task(track_time()))
-tasks.append(asyncio.create_task(update_timer()))
-tasks.append(asyncio.create_task(vc_watcher()))
+    scheduler.every(1800, auto_leave)
+scheduler.every(1, track_time, per_chat=True)
+scheduler.every(7, update_timer, per_chat=True)
+if config.THUMB_PROGRESS:
+    scheduler.every(config.THUMB_PROGRESS, update_thumb, per_chat=True)
+scheduler.every(15, vc_watcher, per_chat=True)
+scheduler.every(600, db.expire_caches)
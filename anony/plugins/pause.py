@@ -5,7 +5,7 @@
 
 from pyrogram import filters, types
 
-from anony import anon, app, db, lang
+from anony import anon, app, db, executor, lang
 from anony.helpers import buttons, can_manage_vc
 
 
@@ -19,7 +19,7 @@ async def _pause(_, m: types.Message):
     if not await db.playing(m.chat.id):
         return await m.reply_text(m.lang["play_already_paused"])
 
-    await anon.pause(m.chat.id)
+    await executor.submit(m.chat.id, anon.pause, m.chat.id)
     await m.reply_text(
         text=m.lang["play_paused"].format(m.from_user.mention),
         reply_markup=buttons.controls(m.chat.id),
@@ -5,7 +5,7 @@
 from pyrogram import filters, types
 import asyncio
 
-from anony import anon, app, config, db, lang, queue, tg, yt
+from anony import anon, app, config, db, executor, lang, prefetch, queue, tg, yt
 from anony.helpers import buttons, utils
 from anony.helpers._play import checkUB
 
@@ -15,6 +15,7 @@ def playlist_to_queue(chat_id: int, tracks: list) -> str:
     for track in tracks:
         pos = queue.add(chat_id, track)
         text += f"<b>{pos}.</b> {track.title}\n"
+    prefetch.schedule(chat_id)
     text = text[:1948] + "</blockquote>"
     return text
 
@@ -87,10 +88,17 @@ async def play_hndlr(
         await utils.play_log(m, file.title, file.duration)
 
     file.user = mention
+    await executor.submit(m.chat.id, enqueue, m, sent, file, tracks, force)
+
+
+async def enqueue(m: types.Message, sent: types.Message, file, tracks: list, force: bool) -> None:
+    """Queue the searched media, and play it if nothing is playing."""
     if force:
         queue.force_add(m.chat.id, file)
+        prefetch.schedule(m.chat.id)
     else:
         position = queue.add(m.chat.id, file)
+        prefetch.schedule(m.chat.id)
 
         if await db.get_call(m.chat.id):
             await sent.edit_text(
@@ -113,8 +121,7 @@ async def play_hndlr(
                 )
             return
 
-    if not file.file_path:
-        file.file_path = await yt.download(file.id, video=video)
+    await prefetch.fetch(file)
 
     await anon.play_media(chat_id=m.chat.id, message=sent, media=file)
     if not tracks:
@@ -6,7 +6,7 @@
 from pyrogram import filters, types
 
 from anony import app, config, db, lang, queue
-from anony.helpers import Track, buttons, thumb
+from anony.helpers import Track, buttons, thumb, utils
 
 
 @app.on_message(filters.command(["queue", "playing"]) & filters.group & ~app.bl_users)
@@ -18,38 +18,39 @@ async def _queue_func(_, m: types.Message):
     _reply = await m.reply_text(m.lang["queue_fetching"])
     _queue = queue.get_queue(m.chat.id)
     _media = _queue[0]
-    _thumb = (
-        await thumb.generate(_media)
-        if isinstance(_media, Track)
-        else config.DEFAULT_THUMB
-    )
+    if isinstance(_media, Track):
+        thumb_key, _thumb = f"thumb_{_media.id}", lambda: thumb.generate(_media)
+    else:
+        thumb_key = _thumb = config.DEFAULT_THUMB
     _text = m.lang["queue_curr"].format(
         _media.url,
         _media.title[:50],
         _media.duration,
         _media.user,
     )
-    _queue.pop(0)
+    _upcoming = _queue[1:15]
 
-    if _queue:
+    if _upcoming:
         _text += "<blockquote expandable>"
-        for i, media in enumerate(_queue, start=1):
-            if i == 15:
-                break
+        for i, media in enumerate(_upcoming, start=1):
             _text += m.lang["queue_item"].format(
                 i + 1, media.title, media.duration
             )
         _text += "</blockquote>"
 
     _playing = await db.playing(m.chat.id)
-    await _reply.edit_media(
-        media=types.InputMediaPhoto(
-            media=_thumb,
-            caption=_text,
-        ),
-        reply_markup=buttons.queue_markup(
-            m.chat.id,
-            m.lang["playing"] if _playing else m.lang["paused"],
-            _playing,
+    await utils.send_photo(
+        thumb_key,
+        _thumb,
+        lambda photo: _reply.edit_media(
+            media=types.InputMediaPhoto(
+                media=photo,
+                caption=_text,
+            ),
+            reply_markup=buttons.queue_markup(
+                m.chat.id,
+                m.lang["playing"] if _playing else m.lang["paused"],
+                _playing,
+            ),
         ),
     )
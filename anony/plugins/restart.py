@@ -5,13 +5,13 @@
 
 import os
 import sys
-import shutil
 import asyncio
 
 from pyrogram import filters, types
 
 from anony import app, db, lang, stop
 
+restarting: asyncio.Task | None = None
 
 @app.on_message(filters.command(["logs"]) & app.sudoers)
 @lang.language()
@@ -46,13 +46,16 @@ async def _logger(_, m: types.Message):
 @app.on_message(filters.command(["restart"]) & app.sudoers)
 @lang.language()
 async def _restart(_, m: types.Message):
+    global restarting
     sent = await m.reply_text(m.lang["restarting"])
-
-    for directory in ["cache", "downloads"]:
-        shutil.rmtree(directory, ignore_errors=True)
-
     await sent.edit_text(m.lang["restarted"])
-    asyncio.create_task(stop())
-    await asyncio.sleep(2)
+    # stop() waits for the dispatcher, and so for this handler: run it
+    # outside of the handler and only replace the process once it's done.
+    restarting = asyncio.create_task(reboot())
+
 
-    os.execl(sys.executable, sys.executable, "-m", "anony")
+async def reboot() -> None:
+    try:
+        await stop()
+    finally:
+        os.execl(sys.executable, sys.executable, "-m", "anony")
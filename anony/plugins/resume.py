@@ -5,7 +5,7 @@
 
 from pyrogram import filters, types
 
-from anony import anon, app, db, lang
+from anony import anon, app, db, executor, lang
 from anony.helpers import buttons, can_manage_vc
 
 
@@ -19,7 +19,7 @@ async def _resume(_, m: types.Message):
     if await db.playing(m.chat.id):
         return await m.reply_text(m.lang["play_not_paused"])
 
-    await anon.resume(m.chat.id)
+    await executor.submit(m.chat.id, anon.resume, m.chat.id)
     await m.reply_text(
         text=m.lang["play_resumed"].format(m.from_user.mention),
         reply_markup=buttons.controls(m.chat.id),
@@ -5,7 +5,7 @@
 
 from pyrogram import filters, types
 
-from anony import anon, app, db, lang
+from anony import anon, app, db, executor, lang
 from anony.helpers import can_manage_vc
 
 
@@ -16,5 +16,5 @@ async def _skip(_, m: types.Message):
     if not await db.get_call(m.chat.id):
         return await m.reply_text(m.lang["not_playing"])
 
-    await anon.play_next(m.chat.id)
+    await executor.submit(m.chat.id, anon.play_next, m.chat.id, key="skip", count=True)
     await m.reply_text(m.lang["play_skipped"].format(m.from_user.mention))
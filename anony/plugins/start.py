@@ -36,11 +36,15 @@ async def start(_, message: types.Message):
     )
 
     key = buttons.start_key(message.lang, private)
-    await message.reply_photo(
-        photo=config.START_IMG,
-        caption=_text,
-        reply_markup=key,
-        quote=not private,
+    await utils.send_photo(
+        config.START_IMG,
+        config.START_IMG,
+        lambda photo: message.reply_photo(
+            photo=photo,
+            caption=_text,
+            reply_markup=key,
+            quote=not private,
+        ),
     )
 
     if private:
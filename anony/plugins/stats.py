@@ -7,20 +7,21 @@ import os
 import platform
 import sys
 
-import psutil
 from pyrogram import __version__, filters, types
 from pytgcalls import __version__ as pytgver
 
-from anony import app, config, db, lang, userbot
+from anony import app, config, db, lang, queue, userbot
+from anony.helpers import thumb, utils
 from anony.plugins import all_modules
 
 
 @app.on_message(filters.command(["stats"]) & filters.group & ~app.bl_users)
 @lang.language()
 async def _stats(_, m: types.Message):
-    sent = await m.reply_photo(
-        photo=config.PING_IMG,
-        caption=m.lang["stats_fetching"],
+    sent = await utils.send_photo(
+        config.PING_IMG,
+        config.PING_IMG,
+        lambda photo: m.reply_photo(photo=photo, caption=m.lang["stats_fetching"]),
     )
 
     pid = os.getpid()
@@ -35,6 +36,8 @@ async def _stats(_, m: types.Message):
         len(await db.get_users()),
     )
     if m.from_user.id in app.sudoers:
+        import psutil
+
         process = psutil.Process(pid)
         storage = psutil.disk_usage("/")
         _utext += m.lang["stats_sudo"].format(
@@ -51,3 +54,28 @@ async def _stats(_, m: types.Message):
             pytgver,
         )
     await sent.edit_caption(_utext)
+
+
+@app.on_message(filters.command(["caches"]) & app.sudoers)
+@lang.language()
+async def _caches(_, m: types.Message):
+    text = m.lang["cache_report"]
+    for cache in [*db.caches(), *db.indexes(), queue, thumb]:
+        stats = cache.stats()
+        text += m.lang["cache_item"].format(
+            stats["name"],
+            stats["entries"],
+            stats["maxsize"] or "∞",
+            stats["bytes"] / 1024,
+        )
+    stats = db.writer.stats()
+    text += m.lang["cache_writes"].format(
+        stats["pending"],
+        stats["written"],
+        stats["flushes"],
+        stats["errors"],
+        stats["last_time"] * 1000,
+        stats["avg_time"] * 1000,
+        stats["max_time"] * 1000,
+    )
+    await m.reply_text(text)
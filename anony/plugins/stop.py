@@ -5,7 +5,7 @@
 
 from pyrogram import filters, types
 
-from anony import anon, app, db, lang
+from anony import anon, app, db, executor, lang
 from anony.helpers import can_manage_vc
 
 
@@ -18,5 +18,5 @@ async def _stop(_, m: types.Message):
     if not await db.get_call(m.chat.id):
         return await m.reply_text(m.lang["not_playing"])
 
-    await anon.stop(m.chat.id)
+    await executor.submit(m.chat.id, anon.stop, m.chat.id, key="stop")
     await m.reply_text(m.lang["play_stopped"].format(m.from_user.mention))
@@ -0,0 +1,145 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+"""
+The thumbnail renderer as it was before the static layers were precomputed
+and the background blur moved to quarter resolution (79f1ae2), kept as is
+as the baseline for bench/thumbnails.py. Not used by the bot.
+"""
+
+from collections import Counter
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
+
+SIZE = (1280, 720)
+FILL = (255, 255, 255, 235)
+MARGIN_X = 80
+MARGIN_Y = 60
+
+fonts = {}
+
+
+def init_worker() -> None:
+    """Load the fonts once per worker process."""
+    fonts["title"] = ImageFont.truetype("anony/helpers/NotoSans-Bold.ttf", 32)
+    fonts["info"] = ImageFont.truetype("anony/helpers/font2.ttf", 28)
+
+
+def truncate_text(draw, text, font, max_width):
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    words = text.split()
+    out = ""
+    for w in words:
+        candidate = (out + " " + w).strip() if out else w
+        if draw.textlength(candidate + ".", font=font) <= max_width:
+            out = candidate
+        else:
+            break
+    return out + "." if out else text[:10] + "."
+
+
+def get_dominant_colors(image, n=2):
+    img = image.resize((100, 100)).convert("RGB")
+    return [c[0] for c in Counter(img.getdata()).most_common(n)]
+
+
+def render(cover_path: str, output: str, title: str, info: str) -> str:
+    """
+    Render the thumbnail of a track from its cover image. Runs in a worker
+    process, so it must only depend on its arguments and the loaded fonts.
+    """
+    if not fonts:
+        init_worker()
+    font_title, font_info = fonts["title"], fonts["info"]
+
+    cover = Image.open(cover_path).convert("RGBA").resize(SIZE, Image.Resampling.LANCZOS)
+
+    bg = cover.filter(ImageFilter.GaussianBlur(32))
+    bg = ImageEnhance.Brightness(bg).enhance(0.42)
+    bg = Image.alpha_composite(bg, Image.new("RGBA", SIZE, (0, 0, 0, 10)))
+
+    vignette = Image.new("L", SIZE, 0)
+    draw_v = ImageDraw.Draw(vignette)
+    draw_v.ellipse((-200, -100, SIZE[0] + 200, SIZE[1] + 300), fill=255)
+    vignette = vignette.filter(ImageFilter.GaussianBlur(2))
+    bg.putalpha(vignette)
+
+    portrait_size = (520, 480)
+    portrait = ImageOps.fit(cover, portrait_size, Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+    mask = Image.new("L", portrait_size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, *portrait_size), radius=40, fill=255)
+    portrait.putalpha(mask)
+
+    shadow = Image.new("RGBA", (portrait_size[0] + 40, portrait_size[1] + 40), (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).rounded_rectangle(
+        (10, 10, portrait_size[0] + 10, portrait_size[1] + 10), radius=40, fill=(0, 0, 0, 180)
+    )
+
+    center_x = SIZE[0] // 2
+    portrait_x = center_x - portrait_size[0] // 2
+    portrait_y = MARGIN_Y
+
+    glow_padding = 32
+    glow_size = (portrait_size[0] + glow_padding * 2, portrait_size[1] + glow_padding * 2)
+    glow_mask = Image.new("L", glow_size, 0)
+    ImageDraw.Draw(glow_mask).rounded_rectangle(
+        (0, 0, *glow_size), radius=40 + glow_padding // 2, fill=255
+    )
+    glow_mask = glow_mask.filter(ImageFilter.GaussianBlur(36))
+
+    dominant = get_dominant_colors(cover, n=1)[0] if cover else (255, 255, 255)
+    colored_glow = Image.composite(
+        Image.new("RGBA", glow_size, (*dominant, 80)),
+        Image.new("RGBA", glow_size, (0, 0, 0, 0)),
+        glow_mask.filter(ImageFilter.GaussianBlur(22))
+    )
+
+    glow_layer = Image.new("RGBA", SIZE, (0, 0, 0, 0))
+    glow_layer.paste(colored_glow, (portrait_x - glow_padding, portrait_y - glow_padding), colored_glow)
+    bg = Image.alpha_composite(bg, glow_layer)
+
+    bg.paste(shadow, (portrait_x, portrait_y + 12), shadow)
+    bg.paste(portrait, (portrait_x, portrait_y), portrait)
+
+    draw = ImageDraw.Draw(bg)
+    text_top = portrait_y + portrait_size[1] + 40
+    safe_width = SIZE[0] - MARGIN_X * 2
+
+    title_text = truncate_text(draw, title, font_title, safe_width - 36)
+    info_text = truncate_text(draw, info, font_info, safe_width - 36)
+
+    title_h = draw.textbbox((0, 0), title_text, font=font_title)[3] - draw.textbbox((0, 0), title_text, font=font_title)[1]
+
+    draw.text((center_x, text_top), title_text, font=font_title, fill=(255, 255, 255, 255), anchor="ma")
+    draw.text((center_x, text_top + title_h + 10), info_text, font=font_info, fill=(255, 248, 230, 255), anchor="ma")
+
+    bar_width = 12
+    bar_x = SIZE[0] - MARGIN_X
+    bar_top = portrait_y + 10
+    bar_bottom = max(text_top - 20, portrait_y + portrait_size[1] - 10)
+
+    track_left = bar_x - bar_width // 2
+    track_right = bar_x + bar_width // 2
+
+    track_layer = Image.new("RGBA", SIZE, (0, 0, 0, 0))
+    tdraw = ImageDraw.Draw(track_layer)
+    tdraw.rounded_rectangle((track_left, bar_top, track_right, bar_bottom), bar_width, fill=(255, 255, 255, 140))
+    bg = Image.alpha_composite(bg, track_layer.filter(ImageFilter.GaussianBlur(1)))
+
+    fill_fraction = 0.6
+    progress_h = int((bar_bottom - bar_top) * fill_fraction)
+    fill_top_y = bar_bottom - progress_h
+
+    fill_layer = Image.new("RGBA", SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(fill_layer).rounded_rectangle(
+        (track_left, fill_top_y, track_right, bar_bottom), bar_width, fill=(*dominant, 255)
+    )
+    bg = Image.alpha_composite(bg, fill_layer.filter(ImageFilter.GaussianBlur(2)))
+
+    draw.text((bar_x - 12, bar_top - 40), "0:00", font=font_info, fill=FILL, anchor="rs")
+    draw.text((bar_x - 12, bar_bottom + 10), "0:30", font=font_info, fill=FILL, anchor="rs")
+
+    bg.save(output, "PNG")
+    return output
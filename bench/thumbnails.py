@@ -0,0 +1,113 @@
+# Copyright (c) 2025 AnonymousX1025
+# Licensed under the MIT License.
+# This file is part of AnonXMusic
+
+"""
+Time the thumbnail renderer in-process, against the renderer it replaced.
+
+    python bench/thumbnails.py [cover.jpg] [-n 20] [--format PNG]
+
+Only needs PIL: the render pipeline is loaded straight from its file, not
+through the anony package. Without a cover a synthetic 1280x720 one is
+used. Besides the timings it prints how far the quarter-resolution
+background blur is from blurring the full frame, as the mean absolute
+difference per channel (0-255).
+"""
+
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import reference_render as old  # noqa: E402
+
+
+def load(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+new = load("_render", os.path.join(ROOT, "anony", "helpers", "_render.py"))
+
+
+def make_cover(path: str) -> None:
+    gradient = Image.linear_gradient("L").resize(new.SIZE)
+    noise = Image.effect_noise(new.SIZE, 64)
+    Image.merge("RGB", (gradient, noise, gradient.rotate(180))).save(path, "JPEG")
+
+
+def timed(func, runs: int, *args) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def blur_difference(cover_path: str) -> float:
+    cover = Image.open(cover_path).convert("RGB")
+    full = cover.resize(new.SIZE, Image.Resampling.BILINEAR).filter(ImageFilter.GaussianBlur(32))
+    small = cover.resize((new.SIZE[0] // 4, new.SIZE[1] // 4), Image.Resampling.BILINEAR)
+    quarter = small.filter(ImageFilter.GaussianBlur(8)).resize(new.SIZE, Image.Resampling.BILINEAR)
+    diff = ImageChops.difference(full, quarter)
+    return statistics.mean(ImageStat.Stat(diff).mean)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("cover", nargs="?")
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument("--format", default="PNG", choices=new.FORMATS)
+    args = parser.parse_args()
+
+    # The fonts are loaded relative to the repository root.
+    os.chdir(ROOT)
+    old.init_worker()
+    new.init_worker()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cover = os.path.abspath(args.cover) if args.cover else os.path.join(tmp, "cover.jpg")
+        if not args.cover:
+            make_cover(cover)
+        ext = new.FORMATS[args.format]
+        output, base = os.path.join(tmp, f"out.{ext}"), os.path.join(tmp, "base.png")
+        old_output = os.path.join(tmp, "old.png")
+        title, info = "Benchmark Track - Some Artist", "Some Channel • 1.2M views"
+
+        dominant = new.render(cover, output, base, title, info, 215, None, args.format)
+        results = {
+            # The old renderer always wrote PNG, and redrew everything to
+            # update the progress bar.
+            "render": (
+                timed(old.render, args.runs, cover, old_output, title, info),
+                timed(new.render, args.runs, cover, output, base, title, info, 215, dominant, args.format),
+            ),
+            "progress": (
+                None,
+                timed(new.render_progress, args.runs, base, output, 100, 215, dominant, args.format),
+            ),
+        }
+        print(f"{args.runs} runs, median (min) in ms, {args.format} output")
+        for name, (before, after) in results.items():
+            before = before or results["render"][0]
+            speedup = statistics.median(before) / statistics.median(after)
+            print(
+                f"{name:<9} old {statistics.median(before):7.1f} ({min(before):6.1f})"
+                f"  new {statistics.median(after):7.1f} ({min(after):6.1f})  x{speedup:.1f}"
+            )
+        print(f"blur      mean difference from a full size blur: {blur_difference(cover):.2f}/255")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,10 @@ class Config:
         
         self.BOT_TOKEN = getenv("BOT_TOKEN")
         self.MONGO_URL = getenv("MONGO_URL")
+        self.DB_BACKEND = getenv("DB_BACKEND", "mongo").lower()
+        self.DB_PATH = getenv("DB_PATH", "anony.sqlite")
+        self.CACHE_BUS = getenv("CACHE_BUS", "local").lower()
+        self.CACHE_BUS_INTERVAL = float(getenv("CACHE_BUS_INTERVAL", 5))
 
         self.LOGGER_ID = int(getenv("LOGGER_ID", 0))
         self.OWNER_ID = int(getenv("OWNER_ID", 0))
@@ -18,6 +22,27 @@ class Config:
         self.DURATION_LIMIT = int(getenv("DURATION_LIMIT", 60)) * 60
         self.QUEUE_LIMIT = int(getenv("QUEUE_LIMIT", 20))
         self.PLAYLIST_LIMIT = int(getenv("PLAYLIST_LIMIT", 20))
+        self.PREFETCH_DEPTH = int(getenv("PREFETCH_DEPTH", 2))
+        self.PREFETCH_WORKERS = int(getenv("PREFETCH_WORKERS", 3))
+        self.DOWNLOADS_LIMIT = int(getenv("DOWNLOADS_LIMIT", 2048))
+        self.THUMB_WORKERS = int(getenv("THUMB_WORKERS", 2))
+        self.THUMB_CACHE_LIMIT = int(getenv("THUMB_CACHE_LIMIT", 256))
+        self.THUMB_FORMAT = getenv("THUMB_FORMAT", "PNG").upper()
+        self.THUMB_QUALITY = int(getenv("THUMB_QUALITY", 85))
+        self.THUMB_PROGRESS = int(getenv("THUMB_PROGRESS", 0))
+        self.CACHE_SIZE = int(getenv("CACHE_SIZE", 5000))
+        self.CACHE_TTL = int(getenv("CACHE_TTL", 6)) * 3600
+        self.ADMIN_TTL = int(getenv("ADMIN_TTL", 600))
+        self.WARM_CHATS = int(getenv("WARM_CHATS", 500))
+        self.WARM_ADMIN_RATE = float(getenv("WARM_ADMIN_RATE", 2))
+        self.WRITE_BATCH = int(getenv("WRITE_BATCH", 500))
+        self.WRITE_DELAY = float(getenv("WRITE_DELAY", 2))
+        self.GCAST_RATE = float(getenv("GCAST_RATE", 25))
+        self.GCAST_WORKERS = int(getenv("GCAST_WORKERS", 10))
+        self.ADMIT_USER = int(getenv("ADMIT_USER", 12))
+        self.ADMIT_CHAT = int(getenv("ADMIT_CHAT", 30))
+        self.ADMIT_GLOBAL = int(getenv("ADMIT_GLOBAL", 300))
+        self.ADMIT_INLINE = int(getenv("ADMIT_INLINE", 30))
 
         self.SESSION1 = getenv("SESSION", None)
         self.SESSION2 = getenv("SESSION2", None)
@@ -40,7 +65,7 @@ class Config:
         missing = [
             var
             for var in ["API_ID", "API_HASH", "BOT_TOKEN", "MONGO_URL", "LOGGER_ID", "OWNER_ID", "SESSION1"]
-            if not getattr(self, var)
+            if not getattr(self, var) and not (var == "MONGO_URL" and self.DB_BACKEND != "mongo")
         ]
         if missing:
             raise SystemExit(f"Missing required environment variables: {', '.join(missing)}")